@@ -4,9 +4,15 @@ from AdminBot.content import KEY_MARKUP
 from AdminBot.content import MESSAGES
 from config import CLIENT_TOKEN, HIDY_BOT_ID
 from Utils.utils import all_configs_settings, rial_to_toman
+from AdminBot.session import list_snapshots
+from Shared.markup_cache import cached_markup
+
+# Buttons per page of paged lists
+USER_PER_PAGE = 20
 
 
 # Main Menu Reply Keyboard Markup
+@cached_markup()
 def main_menu_keyboard_markup():
     markup = ReplyKeyboardMarkup(row_width=3, resize_keyboard=True)
     #markup.add(KeyboardButton(KEY_MARKUP['USERS_LIST']))
@@ -24,13 +30,8 @@ def main_menu_keyboard_markup():
 #----------------------------------Hiddify User ---------------------------------
 # Users List Inline Keyboard Markup
 def users_list_markup(server_id, users, page=1):
-    markup = InlineKeyboardMarkup(row_width=3)
-    USER_PER_PAGE = 20
-    start = (page - 1) * USER_PER_PAGE
-    end = start + USER_PER_PAGE
-    keys = []
-
-    for user in users[start:end]:
+    buttons = []
+    for user in users:
         status_tag = ""
         if user['last_connection'] == "Online" or user['last_connection'] == "آنلاین":
             status_tag = "🔵"
@@ -40,13 +41,18 @@ def users_list_markup(server_id, users, page=1):
             status_tag = "🔴"
         if user['usage']['remaining_usage_GB'] <= 0:
             status_tag = "🔴️"
-
-        keys.append(InlineKeyboardButton(f"{status_tag}|{user['name']}", callback_data=f"info:{user['uuid']}"))
-    markup.add(*keys)
-    if page < len(users) / USER_PER_PAGE:
-        markup.add(InlineKeyboardButton(KEY_MARKUP['NEXT_PAGE'], callback_data=f"next:{page + 1}"), row_width=2)
-    if page > 1:
-        markup.add(InlineKeyboardButton(KEY_MARKUP['PREV_PAGE'], callback_data=f"next:{page - 1}"), row_width=1)
+        buttons.append((f"{status_tag}|{user['name']}", f"info:{user['uuid']}"))
+    cursor = list_snapshots.add(buttons, server_id=server_id)
+    return users_list_page_markup(cursor, page)
+
+
+# Users List Page Inline Keyboard Markup - None if list snapshot is expired
+def users_list_page_markup(cursor, page=1):
+    snapshot = list_snapshots.get(cursor)
+    if not snapshot:
+        return None
+    markup = list_page_markup(snapshot, cursor, page, "next")
+    server_id = snapshot['server_id']
     if server_id != "None":
         markup.add(InlineKeyboardButton(KEY_MARKUP['ADD_USER'], callback_data=f"server_add_user:{server_id}"))
         markup.add(InlineKeyboardButton(KEY_MARKUP['USERS_SEARCH'], callback_data=f"server_search_user:{server_id}"))
@@ -54,6 +60,22 @@ def users_list_markup(server_id, users, page=1):
     return markup
 
 
+# Page of list snapshot - page buttons with next/previous page buttons ({next_key}:{cursor}-{page})
+def list_page_markup(snapshot, cursor, page, next_key):
+    markup = InlineKeyboardMarkup(row_width=3)
+    start = (page - 1) * USER_PER_PAGE
+    end = start + USER_PER_PAGE
+    keys = [InlineKeyboardButton(text, callback_data=data) for text, data in snapshot['buttons'][start:end]]
+    markup.add(*keys)
+    if page < len(snapshot['buttons']) / USER_PER_PAGE:
+        markup.add(InlineKeyboardButton(KEY_MARKUP['NEXT_PAGE'], callback_data=f"{next_key}:{cursor}-{page + 1}"),
+                   row_width=2)
+    if page > 1:
+        markup.add(InlineKeyboardButton(KEY_MARKUP['PREV_PAGE'], callback_data=f"{next_key}:{cursor}-{page - 1}"),
+                   row_width=1)
+    return markup
+
+
 # Single User Inline Keyboard Markup
 def user_info_markup(uuid):
     markup = InlineKeyboardMarkup()
@@ -87,11 +109,13 @@ def edit_user_markup(uuid):
 
 
 # Edit User Reply Keyboard Markup
+@cached_markup()
 def while_edit_user_markup():
     markup = ReplyKeyboardMarkup(row_width=1, resize_keyboard=True)
     markup.add(KeyboardButton(KEY_MARKUP['CANCEL']))
     return markup
 
+@cached_markup()
 def while_edit_skip_user_markup():
     markup = ReplyKeyboardMarkup(row_width=1, resize_keyboard=True)
     markup.add(KeyboardButton(KEY_MARKUP['SKIP']))
@@ -99,6 +123,7 @@ def while_edit_skip_user_markup():
     return markup
 
 # Confirm Add User Reply Keyboard Markup
+@cached_markup()
 def confirm_add_user_markup():
     markup = ReplyKeyboardMarkup(row_width=1, resize_keyboard=True)
     markup.add(KeyboardButton(KEY_MARKUP['CONFIRM']))
@@ -140,6 +165,7 @@ def sub_user_list_markup(uuid,configs):
 
 
 # Search User Inline Keyboard Markup
+@cached_markup()
 def search_user_markup(server_id=None):
     callback_data = server_id if server_id else "None"
     markup = InlineKeyboardMarkup()
@@ -156,6 +182,7 @@ def search_user_markup(server_id=None):
 #----------------------------------Bot User Management ------------------------------
 
 # Users Bot Management - Inline Keyboard Markup
+@cached_markup()
 def users_bot_management_markup(value=None):
     markup = InlineKeyboardMarkup()
     markup.row_width = 3
@@ -179,6 +206,7 @@ def users_bot_management_markup(value=None):
     return markup
 
 # Users Bot Users List Management - Inline Keyboard Markup
+@cached_markup()
 def users_bot_users_management_markup(value=None):
     markup = InlineKeyboardMarkup()
     markup.row_width = 2
@@ -188,6 +216,7 @@ def users_bot_users_management_markup(value=None):
     return markup
 
 # Users Bot Search Method  - Inline Keyboard Markup
+@cached_markup()
 def users_bot_users_search_method_markup(value=None):
     markup = InlineKeyboardMarkup()
     markup.row_width = 2
@@ -198,37 +227,37 @@ def users_bot_users_search_method_markup(value=None):
 
 # Users List Inline Keyboard Markup
 def bot_users_list_markup(users, page=1):
-    markup = InlineKeyboardMarkup(row_width=3)
-    USER_PER_PAGE = 20
-    start = (page - 1) * USER_PER_PAGE
-    end = start + USER_PER_PAGE
-    keys = []
-    for user in users[start:end]:
+    buttons = []
+    for user in users:
         name = user['full_name'] if user['full_name'] else user['telegram_id']
-        keys.append(InlineKeyboardButton(f"{name}", callback_data=f"bot_user_info:{user['telegram_id']}"))
-    markup.add(*keys)
-    if page < len(users) / USER_PER_PAGE:
-        markup.add(InlineKeyboardButton(KEY_MARKUP['NEXT_PAGE'], callback_data=f"bot_user_next:{page + 1}"), row_width=2)
-    if page > 1:
-        markup.add(InlineKeyboardButton(KEY_MARKUP['PREV_PAGE'], callback_data=f"bot_user_next:{page - 1}"), row_width=1)
+        buttons.append((f"{name}", f"bot_user_info:{user['telegram_id']}"))
+    cursor = list_snapshots.add(buttons)
+    return bot_users_list_page_markup(cursor, page)
+
+
+# Users Bot Users List Page Inline Keyboard Markup - None if list snapshot is expired
+def bot_users_list_page_markup(cursor, page=1):
+    snapshot = list_snapshots.get(cursor)
+    if not snapshot:
+        return None
+    markup = list_page_markup(snapshot, cursor, page, "bot_user_next")
     markup.add(InlineKeyboardButton(KEY_MARKUP['BACK'], callback_data=f"back_to_bot_users_or_reffral_management:None"))
     return markup
 
 
 # User Item List Inline Keyboard Markup
 def bot_user_item_list_markup(items, page=1):
-    markup = InlineKeyboardMarkup(row_width=3)
-    USER_PER_PAGE = 20
-    start = (page - 1) * USER_PER_PAGE
-    end = start + USER_PER_PAGE
-    keys = []
-    for item in items[start:end]:
-        keys.append(InlineKeyboardButton(f"{item['id']}", callback_data=f"bot_user_item_info:{item['id']}"))
-    markup.add(*keys)
-    if page < len(items) / USER_PER_PAGE:
-        markup.add(InlineKeyboardButton(KEY_MARKUP['NEXT_PAGE'], callback_data=f"bot_user_item_next:{page + 1}"), row_width=2)
-    if page > 1:
-        markup.add(InlineKeyboardButton(KEY_MARKUP['PREV_PAGE'], callback_data=f"bot_user_item_next:{page - 1}"), row_width=1)
+    buttons = [(f"{item['id']}", f"bot_user_item_info:{item['id']}") for item in items]
+    cursor = list_snapshots.add(buttons)
+    return bot_user_item_list_page_markup(cursor, page)
+
+
+# User Item List Page Inline Keyboard Markup - None if list snapshot is expired
+def bot_user_item_list_page_markup(cursor, page=1):
+    snapshot = list_snapshots.get(cursor)
+    if not snapshot:
+        return None
+    markup = list_page_markup(snapshot, cursor, page, "bot_user_item_next")
     markup.add(InlineKeyboardButton(KEY_MARKUP['BACK'], callback_data=f"back_management_item_list:None"))
     return markup
 
@@ -249,6 +278,7 @@ def bot_user_info_markup(telegram_id):
     return markup
 
 # Users Bot Users List Management - Inline Keyboard Markup
+@cached_markup()
 def users_bot_orders_management_markup(value=None):
     markup = InlineKeyboardMarkup()
     markup.row_width = 2
@@ -288,6 +318,7 @@ def confirm_change_status_payment_by_admin(payment_id):
     return markup
 
 # Users Bot Payments List Management - Inline Keyboard Markup
+@cached_markup()
 def users_bot_payments_management_markup(value=None):
     markup = InlineKeyboardMarkup()
     markup.row_width = 2
@@ -458,6 +489,7 @@ def users_bot_management_settings_visible_sub_markup(settings):
     return markup
 
 # Users Bot Management - Settings - Manual - Inline Keyboard Markup
+@cached_markup()
 def users_bot_management_settings_panel_manual_markup():
     markup = InlineKeyboardMarkup()
     markup.row_width = 1
@@ -474,6 +506,7 @@ def users_bot_management_settings_panel_manual_markup():
     markup.add(InlineKeyboardButton(KEY_MARKUP['BACK'], callback_data=f"users_bot_settings:None"))
     return markup
 
+@cached_markup(settings=True)
 def users_bot_management_settings_faq_markup():
     markup = InlineKeyboardMarkup()
     markup.row_width = 1
@@ -488,6 +521,7 @@ def users_bot_management_settings_faq_markup():
 
 
 # Users Bot Management - Edit Owner Info - Inline Keyboard Markup
+@cached_markup()
 def users_bot_edit_owner_info_markup():
     markup = InlineKeyboardMarkup()
     markup.row_width = 1
@@ -499,6 +533,7 @@ def users_bot_edit_owner_info_markup():
                                     callback_data=f"users_bot_owner_info_edit_card_name:None"))
     return markup
 
+@cached_markup()
 def users_bot_management_settings_reset_free_test_markup():
     markup = InlineKeyboardMarkup()
     markup.row_width = 1
@@ -603,6 +638,7 @@ def plan_info_selected_markup(server_id):
 
 #-------------------------------------End Servers Management -------------------------------------
 
+@cached_markup()
 def start_bot_markup():
     markup = InlineKeyboardMarkup()
     markup.row_width = 1
@@ -0,0 +1,102 @@
+# Description: Per chat state of admin bot (selected server, search and list modes).
+# Each admin chat has its own session, so admins working at the same time don't change each other's lists.
+import json
+import logging
+import secrets
+import threading
+from collections import OrderedDict
+from Database.dbManager import USERS_DB
+from config import ADMIN_SESSIONS_PERSIST, LIST_SNAPSHOTS_SIZE
+
+# Default state of a new chat
+SESSION_DEFAULTS = {
+    # API url of selected server
+    'url': 'url',
+    'selected_server': None,
+    # Single, Single_name, Single_expired, All_server_name, All_server_expired
+    'search_mode': "Single",
+    # All, Single
+    'server_mode': "Single",
+    'searched_name': "",
+    # User_Orders, User_Payments, User_Gifts, Orders, Approved_Payments
+    # Non_Approved_Payments, Pending_Payments, Card_Payments, Digital_Payments
+    # Bot_User, Bot_Users_Search_Name, User_Refferals
+    'list_mode': "",
+    # Order, Payment, Gift
+    'item_mode': "",
+    'selected_telegram_id': "0",
+}
+
+
+# State of one chat - dict with defaults, every change is written to database if persist is on
+class ChatSession(dict):
+    def __init__(self, chat_id, data=None, persist=False):
+        super().__init__(SESSION_DEFAULTS)
+        if data:
+            self.update(data)
+        self.chat_id = chat_id
+        self.persist = persist
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        if self.persist:
+            USERS_DB.set_admin_session(self.chat_id, json.dumps(self, default=str))
+
+
+# Sessions of all chats - loaded from database on first use if persist is on
+class SessionStore:
+    def __init__(self, persist=ADMIN_SESSIONS_PERSIST):
+        self.persist = persist
+        self.sessions = {}
+        self.lock = threading.Lock()
+
+    def get(self, chat_id):
+        with self.lock:
+            session = self.sessions.get(chat_id)
+            if session is None:
+                session = ChatSession(chat_id, self.load(chat_id), self.persist)
+                self.sessions[chat_id] = session
+            return session
+
+    def load(self, chat_id):
+        if not self.persist:
+            return None
+        data = USERS_DB.find_admin_session(chat_id)
+        if not data:
+            return None
+        try:
+            return json.loads(data)
+        except ValueError as e:
+            logging.warning(f"Invalid session of chat {chat_id}: {e}")
+            return None
+
+
+sessions = SessionStore()
+
+
+# Materialized lists for paging - {cursor: snapshot}, cursor is sent in callback data of page buttons.
+# Oldest snapshots are dropped when full; their page buttons then rebuild the list.
+class ListSnapshots:
+    def __init__(self, size=LIST_SNAPSHOTS_SIZE):
+        self.size = size
+        self.snapshots = OrderedDict()
+        self.lock = threading.Lock()
+
+    # Store list buttons [(text, callback_data)] - return cursor
+    def add(self, buttons, **meta):
+        cursor = secrets.token_hex(4)
+        with self.lock:
+            self.snapshots[cursor] = dict(meta, buttons=buttons)
+            while len(self.snapshots) > self.size:
+                self.snapshots.popitem(last=False)
+        return cursor
+
+    def get(self, cursor):
+        with self.lock:
+            snapshot = self.snapshots.get(cursor)
+            if snapshot is not None:
+                self.snapshots.move_to_end(cursor)
+            return snapshot
+
+
+list_snapshots = ListSnapshots()
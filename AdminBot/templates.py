@@ -1,7 +1,7 @@
 # Description: This file contains all the templates used in the bot.
 from config import LANG, VERSION, API_PATH
 from AdminBot.content import MESSAGES
-from Utils import api, utils 
+from Utils import api, utils, mirror
 import datetime
 import urllib.parse
 
@@ -70,55 +70,68 @@ def plan_info_template(plan, orders, header=""):
 """
 
 # Users List Message Template
-def users_list_template(users, heder=""):
+# url is set if users list is of one server - list may be served from panel mirror, its age is shown
+def users_list_template(users, heder="", url=None):
     # Number of Online Users
     online_users = 0
     for user in users:
         if user['last_connection'] == "Online" or user['last_connection'] == "آنلاین":
             online_users += 1
 
+    data_age = ""
+    age = mirror.staleness(url) if url else None
+    if age is not None and round(age) > 0:
+        data_age = f"{MESSAGES['PANEL_DATA_AGE']} {round(age)}\n"
+
     return f"""
 {heder}
 {MESSAGES['HEADER_USERS_LIST']}
 {MESSAGES['HEADER_USERS_LIST_MSG']}
 {MESSAGES['NUM_USERS']} {len(users)}
 {MESSAGES['NUM_USERS_ONLINE']} {online_users} 
-"""
+{data_age}"""
 
 
 # Bot Users List Message Template
+# users, wallets and orders can be lists or iterators (USERS_DB.iter_rows), each is read once
 def bot_users_list_template(users, wallets, orders, header=""):
-
+    num_users = 0
     users_get_free = 0
     ordered_users = 0
     total_balance_wallets= 0
     if wallets:
         for wallet in wallets:
             total_balance_wallets += wallet['balance']
+    ordered_telegram_ids = set()
     if orders:
-        for user in users:
-            if user['test_subscription']:
-                users_get_free += 1
-            for order in orders:
-                if order['telegram_id'] == user['telegram_id']:
-                    ordered_users += 1
-                    break
-    else:
-        for user in users:
-            if user['test_subscription']:
-                users_get_free += 1
-        
+        ordered_telegram_ids = {order['telegram_id'] for order in orders}
+    for user in users:
+        num_users += 1
+        if user['test_subscription']:
+            users_get_free += 1
+        if user['telegram_id'] in ordered_telegram_ids:
+            ordered_users += 1
 
     return f"""
 {header}
 <b>{MESSAGES['HEADER_USERS_LIST']}</b>
 {MESSAGES['HEADER_USERS_LIST_MSG']}
-{MESSAGES['NUM_USERS']} {len(users)}
+{MESSAGES['NUM_USERS']} {num_users}
 {MESSAGES['NUM_GET_FREE_USERS']} {users_get_free}
 {MESSAGES['NUM_ORDERED_USERS']} {ordered_users}
 {MESSAGES['TOTAL_BALANCE_USERS']} {utils.rial_to_toman(total_balance_wallets)}{MESSAGES['TOMAN']}
 """
 
+# Broadcast Progress Message Template
+def broadcast_progress_template(broadcast, header=""):
+    done = broadcast['sent'] + broadcast['failed']
+    return f"""
+{header}
+{done} {MESSAGES['OF']} {broadcast['total']}
+{MESSAGES['BROADCAST_SENT']} {broadcast['sent']}
+{MESSAGES['BROADCAST_FAILED']} {broadcast['failed']}
+"""
+
 # Bot Users Info Message Template
 def bot_users_info_template(user, orders, payments, wallet, non_order_subs, order_subs, plans, header=""):
     total_orders = 0
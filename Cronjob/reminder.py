@@ -1,11 +1,9 @@
 from Utils.utils import *
 from UserBot.bot import bot
-from config import CLIENT_TOKEN
+from config import CLIENT_TOKEN, REMINDER_SEND_WORKERS, REMINDER_FAN_OUT_DEADLINE
+from Utils.broadcast import send_message_with_retry
+from concurrent.futures import ThreadPoolExecutor
 from UserBot.templates import package_size_end_soon_template, package_days_expire_soon_template
-try:
-    bot.remove_webhook()
-except:
-    pass
 
 settings = all_configs_settings()
 ALERT_PACKAGE_GB = settings.get('reminder_notification_usage', 3)
@@ -24,6 +22,42 @@ def alert_package_days(package_remaining_days):
     return False
 
 
+# Alerts of subscriptions of bot users - return [(telegram_id, sub_id, alert_type, text)]
+def reminder_alerts():
+    alerts = []
+    subscriptions = USERS_DB.find_user_subscriptions()
+    if not subscriptions:
+        return alerts
+    # only owners registered in bot are reminded (subscriptions of removed users are kept in database)
+    subscriptions = [subscription for subscription in subscriptions
+                     if USERS_DB.is_registered_user(subscription['telegram_id'])]
+    # one users list request per server, joined with subscriptions locally
+    for subscription, user_subscription in subscriptions_info(subscriptions, REMINDER_FAN_OUT_DEADLINE):
+        package_days = user_subscription.get('remaining_day', 0)
+        package_gb = user_subscription.get('usage', {}).get('remaining_usage_GB', 0)
+        sub_id = user_subscription.get('sub_id')
+        if package_days == 0:
+            continue
+        if alert_package_gb(package_gb):
+            alerts.append((subscription['telegram_id'], sub_id, "package_gb",
+                           package_size_end_soon_template(sub_id, package_gb)))
+        if alert_package_days(package_days):
+            alerts.append((subscription['telegram_id'], sub_id, "package_days",
+                           package_days_expire_soon_template(sub_id, package_days)))
+    return alerts
+
+
+# Send alert if it is not sent today
+def send_reminder_alert(alert, sent_alerts, today):
+    telegram_id, sub_id, alert_type, text = alert
+    if (telegram_id, sub_id, alert_type) in sent_alerts:
+        return False
+    if not send_message_with_retry(bot, telegram_id, text):
+        return False
+    USERS_DB.add_sent_reminder(telegram_id, sub_id, alert_type, today)
+    return True
+
+
 # Send a reminder to users about their packages
 def cron_reminder():
     if not CLIENT_TOKEN:
@@ -31,19 +65,15 @@ def cron_reminder():
     if not settings['reminder_notification']:
         return
 
-    telegram_users = USERS_DB.select_users()
-    if telegram_users:
-        for user in telegram_users:
-            user_telegram_id = user['telegram_id']
-            user_subscriptions_list = non_order_user_info(user_telegram_id) + order_user_info(user_telegram_id)
-            if user_subscriptions_list:
-                for user_subscription in user_subscriptions_list:
-                    package_days = user_subscription.get('remaining_day', 0)
-                    package_gb = user_subscription.get('usage', {}).get('remaining_usage_GB', 0)
-                    sub_id = user_subscription.get('sub_id')
-                    if package_days == 0:
-                        continue
-                    if alert_package_gb(package_gb):
-                        bot.send_message(user_telegram_id, package_size_end_soon_template(sub_id, package_gb))
-                    if alert_package_days(package_days):
-                        bot.send_message(user_telegram_id, package_days_expire_soon_template(sub_id, package_days))
+    today = datetime.now().strftime("%Y-%m-%d")
+    USERS_DB.delete_sent_reminders_before(today)
+    sent_reminders = USERS_DB.find_sent_reminder(sent_at=today)
+    sent_alerts = set()
+    if sent_reminders:
+        sent_alerts = {(row['telegram_id'], row['sub_id'], row['alert_type']) for row in sent_reminders}
+
+    alerts = reminder_alerts()
+    logging.info(f"Reminder - {len(alerts)} alerts, {len(sent_alerts)} already sent today")
+    with ThreadPoolExecutor(max_workers=REMINDER_SEND_WORKERS) as executor:
+        sent = sum(executor.map(lambda alert: send_reminder_alert(alert, sent_alerts, today), alerts))
+    logging.info(f"Reminder - {sent} alerts sent")
@@ -3,6 +3,7 @@ import json
 import logging
 import os
 import sqlite3
+import threading
 from sqlite3 import Error
 from version import is_version_less
 #from urllib.parse import urlparse
@@ -11,31 +12,215 @@ from version import is_version_less
 #from config import PANEL_URL, API_PATH, USERS_DB_LOC
 
 
+# Seconds to wait for a lock held by another connection (bots, cronjobs) before "database is locked"
+DB_BUSY_TIMEOUT = 30
+
+# Schema migrations - (version, statements), applied once in order and recorded in schema_version
+SCHEMA_MIGRATIONS = [
+    (1, ["CREATE INDEX IF NOT EXISTS idx_orders_telegram_id ON orders (telegram_id)",
+         "CREATE INDEX IF NOT EXISTS idx_order_subscriptions_order_id ON order_subscriptions (order_id)",
+         "CREATE INDEX IF NOT EXISTS idx_order_subscriptions_uuid ON order_subscriptions (uuid)",
+         "CREATE INDEX IF NOT EXISTS idx_non_order_subscriptions_telegram_id ON non_order_subscriptions (telegram_id)",
+         "CREATE INDEX IF NOT EXISTS idx_payments_telegram_id ON payments (telegram_id)",
+         "CREATE INDEX IF NOT EXISTS idx_payments_approved ON payments (approved)",
+         "CREATE INDEX IF NOT EXISTS idx_plans_server_id ON plans (server_id)",
+         "CREATE INDEX IF NOT EXISTS idx_sent_reminders_sent_at ON sent_reminders (sent_at)"]),
+]
+
+# Tables saved to JSON backup and restored from it
+BACKUP_TABLES = ['users', 'plans', 'orders', 'order_subscriptions', 'non_order_subscriptions',
+                 'str_config', 'int_config', 'bool_config', 'wallet', 'payments', 'servers']
+
+# Tables and columns queried by find_* (SELECT * FROM table WHERE column=?)
+FIND_QUERIES = {
+    'users': ['telegram_id', 'full_name', 'username'],
+    'plans': ['id', 'server_id'],
+    'orders': ['id', 'telegram_id'],
+    'order_subscriptions': ['id', 'order_id', 'uuid', 'server_id'],
+    'non_order_subscriptions': ['id', 'telegram_id', 'uuid', 'server_id'],
+    'bool_config': ['key'],
+    'str_config': ['key'],
+    'int_config': ['key'],
+    'wallet': ['telegram_id'],
+    'payments': ['id', 'telegram_id', 'approved'],
+    'servers': ['id', 'default_server'],
+}
+
+
+# Rows of cursor as dicts - column names are read once per query
+def rows_to_dicts(cur, rows):
+    columns = [key[0] for key in cur.description]
+    return [dict(zip(columns, row)) for row in rows]
+
+
+# Read-only record with __slots__, supports row['key'], row.get('key') and dict(row)
+class Record:
+    __slots__ = ()
+
+    def __init__(self, row):
+        for column, value in zip(self.__slots__, row):
+            setattr(self, column, value)
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, key)
+        except (AttributeError, TypeError):
+            raise KeyError(key)
+
+    def __contains__(self, key):
+        return key in self.__slots__
+
+    def get(self, key, default=None):
+        return getattr(self, key, default)
+
+    def keys(self):
+        return self.__slots__
+
+    def to_dict(self):
+        return {column: getattr(self, column) for column in self.__slots__}
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.to_dict()})"
+
+
+# Record classes - one per (table, columns)
+record_classes = {}
+
+
+def record_class(table, columns):
+    key = (table, tuple(columns))
+    row_record = record_classes.get(key)
+    if not row_record:
+        row_record = type(f"{table.title().replace('_', '')}Record", (Record,), {'__slots__': tuple(columns)})
+        record_classes[key] = row_record
+    return row_record
 
 
 class UserDBManager:
     def __init__(self, db_file):
-        self.conn = self.create_connection(db_file)
+        self.db_file = db_file
+        # One connection per thread - {thread_id: connection}
+        self.connections = {}
+        self.connections_lock = threading.Lock()
+        self.columns_cache = {}
+        # Bumped on every config write - cached settings with an older version are reloaded
+        self.config_version = 0
+        # Registered and banned telegram ids - see user_sets()
+        self.registered_users = None
+        self.banned_users = None
+        self.user_sets_lock = threading.Lock()
         self.create_user_table()
         #self.set_default_configs()
 
+    # Connection of the current thread (created on first use)
+    @property
+    def conn(self):
+        thread_id = threading.get_ident()
+        conn = self.connections.get(thread_id)
+        if conn:
+            return conn
+        conn = self.create_connection(self.db_file)
+        with self.connections_lock:
+            # close connections of finished threads
+            alive_threads = {thread.ident for thread in threading.enumerate()}
+            for old_thread_id in [key for key in self.connections if key not in alive_threads]:
+                self.connections.pop(old_thread_id).close()
+            self.connections[thread_id] = conn
+        return conn
+
     #close connection
     def __del__(self):
-        self.conn.close()
+        self.close()
     
     def close(self):
-        self.conn.close()
+        with self.connections_lock:
+            for conn in self.connections.values():
+                conn.close()
+            self.connections = {}
     
 
     def create_connection(self, db_file):
         """ Create a database connection to a SQLite database """
         try:
-            conn = sqlite3.connect(db_file, check_same_thread=False)
+            conn = sqlite3.connect(db_file, timeout=DB_BUSY_TIMEOUT, check_same_thread=False)
+            # WAL - readers do not block the writer and the writer does not block readers
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(f"PRAGMA busy_timeout={DB_BUSY_TIMEOUT * 1000}")
             return conn
         except Error as e:
             logging.error(f"Error while connecting to database \n Error:{e}")
             return None
 
+    # Column names of table from its schema (cached)
+    def table_columns(self, table):
+        columns = self.columns_cache.get(table)
+        if columns:
+            return columns
+        cur = self.conn.cursor()
+        try:
+            cur.execute(f"PRAGMA table_info({table})")
+            columns = [row[1] for row in cur.fetchall()]
+        except Error as e:
+            logging.error(f"Error while reading columns of [{table}] \n Error:{e}")
+            return []
+        if columns:
+            self.columns_cache[table] = columns
+        return columns
+
+    # Several row updates in one transaction - updates: [(table, where_key, where_value, {column: value})]
+    # One UPDATE per row, column names are checked against the table schema
+    def update_many(self, updates):
+        queries = []
+        for table, where_key, where_value, changes in updates:
+            if not changes:
+                continue
+            columns = self.table_columns(table)
+            invalid_columns = [key for key in list(changes) + [where_key] if key not in columns]
+            if invalid_columns:
+                logging.error(f"Error while updating [{table}] - invalid columns {invalid_columns}")
+                return False
+            set_columns = ", ".join([f"{key}=?" for key in changes])
+            queries.append((f"UPDATE {table} SET {set_columns} WHERE {where_key}=?",
+                            tuple(changes.values()) + (where_value,)))
+        if not queries:
+            return True
+        try:
+            with self.conn:
+                for query, values in queries:
+                    self.conn.execute(query, values)
+            for table, where_key, where_value, changes in updates:
+                logging.info(f"{table} [{where_value}] successfully update {changes}")
+            return True
+        except Error as e:
+            logging.error(f"Error while updating {[update[:3] for update in updates]} \n Error: {e}")
+            return False
+
+    # Single UPDATE of one row
+    def update_row(self, table, where_key, where_value, **kwargs):
+        return self.update_many([(table, where_key, where_value, kwargs)])
+
+    # Same changes for many rows in one transaction (e.g. reset test subscription of users)
+    def update_rows(self, table, where_key, where_values, **kwargs):
+        if not kwargs or not where_values:
+            return True
+        columns = self.table_columns(table)
+        invalid_columns = [key for key in list(kwargs) + [where_key] if key not in columns]
+        if invalid_columns:
+            logging.error(f"Error while updating [{table}] - invalid columns {invalid_columns}")
+            return False
+        set_columns = ", ".join([f"{key}=?" for key in kwargs])
+        values = tuple(kwargs.values())
+        try:
+            with self.conn:
+                self.conn.executemany(f"UPDATE {table} SET {set_columns} WHERE {where_key}=?",
+                                      [values + (where_value,) for where_value in where_values])
+            logging.info(f"{table} [{len(where_values)} rows] successfully update {kwargs}")
+            return True
+        except Error as e:
+            logging.error(f"Error while updating {table} [{len(where_values)} rows] \n Error: {e}")
+            return False
+
     def create_user_table(self):
         cur = self.conn.cursor()
         try:
@@ -154,23 +339,198 @@ class UserDBManager:
             self.conn.commit()
             logging.info("Servers table created successfully!")
 
+            cur.execute("CREATE TABLE IF NOT EXISTS broadcasts ("
+                        "id INTEGER PRIMARY KEY AUTOINCREMENT,"
+                        "admin_id INTEGER NOT NULL,"
+                        "message TEXT NOT NULL,"
+                        "status TEXT NOT NULL DEFAULT 'running',"
+                        "total INTEGER NOT NULL DEFAULT 0,"
+                        "sent INTEGER NOT NULL DEFAULT 0,"
+                        "failed INTEGER NOT NULL DEFAULT 0,"
+                        "last_user_id INTEGER NOT NULL DEFAULT 0,"
+                        "progress_message_id INTEGER NULL,"
+                        "created_at TEXT NOT NULL)")
+            self.conn.commit()
+            logging.info("Broadcasts table created successfully!")
+
+            cur.execute("CREATE TABLE IF NOT EXISTS broadcast_recipients ("
+                        "broadcast_id INTEGER NOT NULL,"
+                        "user_id INTEGER NOT NULL,"
+                        "sent BOOLEAN NOT NULL,"
+                        "PRIMARY KEY (broadcast_id, user_id))")
+            self.conn.commit()
+            logging.info("Broadcast recipients table created successfully!")
+
+            cur.execute("CREATE TABLE IF NOT EXISTS sent_reminders ("
+                        "id INTEGER PRIMARY KEY AUTOINCREMENT,"
+                        "telegram_id INTEGER NOT NULL,"
+                        "sub_id INTEGER NOT NULL,"
+                        "alert_type TEXT NOT NULL,"
+                        "sent_at TEXT NOT NULL,"
+                        "UNIQUE (telegram_id, sub_id, alert_type, sent_at))")
+            self.conn.commit()
+            logging.info("Sent reminders table created successfully!")
+
+            cur.execute("CREATE TABLE IF NOT EXISTS admin_sessions ("
+                        "chat_id INTEGER PRIMARY KEY,"
+                        "data TEXT NOT NULL,"
+                        "updated_at TEXT NOT NULL)")
+            self.conn.commit()
+            logging.info("Admin sessions table created successfully!")
+
+            cur.execute("CREATE TABLE IF NOT EXISTS panel_users ("
+                        "url TEXT NOT NULL,"
+                        "uuid TEXT NOT NULL,"
+                        "name TEXT NULL,"
+                        "data TEXT NOT NULL,"
+                        "PRIMARY KEY (url, uuid))")
+            self.conn.commit()
+            logging.info("Panel users table created successfully!")
+
+            cur.execute("CREATE TABLE IF NOT EXISTS panel_sync ("
+                        "url TEXT PRIMARY KEY,"
+                        "synced_at REAL NOT NULL,"
+                        "users INTEGER NOT NULL DEFAULT 0)")
+            self.conn.commit()
+            logging.info("Panel sync table created successfully!")
+
+            cur.execute("CREATE TABLE IF NOT EXISTS next_step_handlers ("
+                        "bot TEXT NOT NULL,"
+                        "chat_id INTEGER NOT NULL,"
+                        "handlers BLOB NOT NULL,"
+                        "expires_at REAL NOT NULL,"
+                        "PRIMARY KEY (bot, chat_id))")
+            self.conn.commit()
+            logging.info("Next step handlers table created successfully!")
+
+            cur.execute("CREATE TABLE IF NOT EXISTS schema_version ("
+                        "version INTEGER NOT NULL,"
+                        "applied_at TEXT NOT NULL)")
+            self.conn.commit()
+            logging.info("Schema version table created successfully!")
+
 
         except Error as e:
             logging.error(f"Error while creating user table \n Error:{e}")
             return False
+        return self.migrate()
+
+    def schema_version(self):
+        cur = self.conn.cursor()
+        try:
+            cur.execute("SELECT MAX(version) FROM schema_version")
+            version = cur.fetchone()[0]
+            return version if version else 0
+        except Error as e:
+            logging.error(f"Error while reading schema version \n Error:{e}")
+            return None
+
+    def migrate(self):
+        version = self.schema_version()
+        if version is None:
+            return False
+        cur = self.conn.cursor()
+        for migration_version, statements in SCHEMA_MIGRATIONS:
+            if migration_version <= version:
+                continue
+            try:
+                for statement in statements:
+                    cur.execute(statement)
+                cur.execute("INSERT INTO schema_version(version, applied_at) VALUES(?,?)",
+                            (migration_version, datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
+                self.conn.commit()
+                logging.info(f"Database migrated to schema version {migration_version}")
+            except Error as e:
+                self.conn.rollback()
+                logging.error(f"Error while migrating database to version {migration_version} \n Error:{e}")
+                return False
         return True
 
+    # Query plans of find_* queries - full_scan is True when the table is scanned without an index
+    def explain_find_queries(self):
+        cur = self.conn.cursor()
+        plans = []
+        for table, columns in FIND_QUERIES.items():
+            for column in columns:
+                try:
+                    cur.execute(f"EXPLAIN QUERY PLAN SELECT * FROM {table} WHERE {column}=?", (None,))
+                    detail = " | ".join([row[-1] for row in cur.fetchall()])
+                except Error as e:
+                    logging.error(f"Error while explaining query on {table}.{column} \n Error:{e}")
+                    continue
+                full_scan = detail.startswith("SCAN")
+                if full_scan:
+                    logging.warning(f"Full table scan: SELECT * FROM {table} WHERE {column}=? ({detail})")
+                plans.append({'table': table, 'column': column, 'plan': detail, 'full_scan': full_scan})
+        return plans
+
     def select_users(self):
         cur = self.conn.cursor()
         try:
             cur.execute("SELECT * FROM users")
             rows = cur.fetchall()
-            rows = [dict(zip([key[0] for key in cur.description], row)) for row in rows]
+            rows = rows_to_dicts(cur, rows)
             return rows
         except Error as e:
             logging.error(f"Error while selecting all users \n Error:{e}")
             return None
 
+    # Stream all rows of table as records, fetched in batches - order_by: SQL ORDER BY clause (e.g. "id DESC")
+    def iter_rows(self, table, batch_size=500, order_by=None):
+        cur = self.conn.cursor()
+        try:
+            cur.execute(f"SELECT * FROM {table}" + (f" ORDER BY {order_by}" if order_by else ""))
+            row_record = record_class(table, [key[0] for key in cur.description])
+            rows = cur.fetchmany(batch_size)
+            while rows:
+                for row in rows:
+                    yield row_record(row)
+                rows = cur.fetchmany(batch_size)
+        except Error as e:
+            logging.error(f"Error while iterating {table} \n Error:{e}")
+
+    def iter_users(self, order_by=None):
+        return self.iter_rows("users", order_by=order_by)
+
+    # Registered and banned telegram ids - (registered, banned), loaded once and shared by both bots
+    def user_sets(self):
+        registered_users, banned_users = self.registered_users, self.banned_users
+        if registered_users is not None:
+            return registered_users, banned_users
+        cur = self.conn.cursor()
+        try:
+            cur.execute("SELECT telegram_id, banned FROM users")
+            rows = cur.fetchall()
+        except Error as e:
+            logging.error(f"Error while loading users ids \n Error:{e}")
+            return None
+        with self.user_sets_lock:
+            if self.registered_users is None:
+                self.banned_users = {row[0] for row in rows if row[1]}
+                self.registered_users = {row[0] for row in rows}
+                logging.info(f"Users ids loaded - {len(self.registered_users)} users, "
+                             f"{len(self.banned_users)} banned")
+            return self.registered_users, self.banned_users
+
+    # Reload ids on next check (users deleted or restored)
+    def invalidate_user_sets(self):
+        with self.user_sets_lock:
+            self.registered_users = None
+            self.banned_users = None
+
+    def is_registered_user(self, telegram_id):
+        sets = self.user_sets()
+        if not sets:
+            return bool(self.find_user(telegram_id=telegram_id))
+        return telegram_id in sets[0]
+
+    def is_banned_user(self, telegram_id):
+        sets = self.user_sets()
+        if not sets:
+            users = self.find_user(telegram_id=telegram_id)
+            return bool(users and users[0]['banned'])
+        return telegram_id in sets[1]
+
     def find_user(self, **kwargs):
         if len(kwargs) != 1:
             logging.warning("You can only use one key to find user!")
@@ -184,7 +544,7 @@ class UserDBManager:
             if len(rows) == 0:
                 logging.info(f"User {kwargs} not found!")
                 return None
-            rows = [dict(zip([key[0] for key in cur.description], row)) for row in rows]
+            rows = rows_to_dicts(cur, rows)
             return rows
         except Error as e:
             logging.error(f"Error while finding user {kwargs} \n Error:{e}")
@@ -199,6 +559,7 @@ class UserDBManager:
             for key, value in kwargs.items():
                 cur.execute(f"DELETE FROM users WHERE {key}=?", (value,))
                 self.conn.commit()
+            self.invalidate_user_sets()
             logging.info(f"User {kwargs} deleted successfully!")
             return True
         except Error as e:
@@ -206,18 +567,15 @@ class UserDBManager:
             return False
 
     def edit_user(self, telegram_id, **kwargs):
-        cur = self.conn.cursor()
-
-        for key, value in kwargs.items():
-            try:
-                cur.execute(f"UPDATE users SET {key}=? WHERE telegram_id=?", (value, telegram_id))
-                self.conn.commit()
-                logging.info(f"User [{telegram_id}] successfully update [{key}] to [{value}]")
-            except Error as e:
-                logging.error(f"Error while updating user [{telegram_id}] [{key}] to [{value}] \n Error: {e}")
-                return False
-
-        return True
+        status = self.update_row("users", "telegram_id", telegram_id, **kwargs)
+        sets = self.user_sets() if status and 'banned' in kwargs else None
+        if sets:
+            with self.user_sets_lock:
+                if kwargs['banned']:
+                    sets[1].add(int(telegram_id))
+                else:
+                    sets[1].discard(int(telegram_id))
+        return status
 
     def add_user(self, telegram_id, full_name,username, created_at):
         cur = self.conn.cursor()
@@ -225,6 +583,10 @@ class UserDBManager:
             cur.execute("INSERT INTO users(telegram_id, full_name,username, created_at) VALUES(?,?,?,?)",
                         (telegram_id, full_name,username, created_at))
             self.conn.commit()
+            sets = self.user_sets()
+            if sets:
+                with self.user_sets_lock:
+                    sets[0].add(int(telegram_id))
             logging.info(f"User [{telegram_id}] added successfully!")
             return True
 
@@ -250,7 +612,7 @@ class UserDBManager:
         try:
             cur.execute("SELECT * FROM plans ORDER BY price ASC")
             rows = cur.fetchall()
-            rows = [dict(zip([key[0] for key in cur.description], row)) for row in rows]
+            rows = rows_to_dicts(cur, rows)
             return rows
         except Error as e:
             logging.error(f"Error while selecting all plans \n Error:{e}")
@@ -269,7 +631,7 @@ class UserDBManager:
             if len(rows) == 0:
                 logging.info(f"Plan {kwargs} not found!")
                 return None
-            rows = [dict(zip([key[0] for key in cur.description], row)) for row in rows]
+            rows = rows_to_dicts(cur, rows)
             return rows
         except Error as e:
             logging.error(f"Error while finding plan {kwargs} \n Error:{e}")
@@ -291,18 +653,8 @@ class UserDBManager:
             return False
 
     def edit_plan(self, plan_id, **kwargs):
-        cur = self.conn.cursor()
+        return self.update_row("plans", "id", plan_id, **kwargs)
 
-        for key, value in kwargs.items():
-            try:
-                cur.execute(f"UPDATE plans SET {key}=? WHERE id=?", (value, plan_id))
-                self.conn.commit()
-                logging.info(f"Plan [{plan_id}] successfully update [{key}] to [{value}]")
-            except Error as e:
-                logging.error(f"Error while updating plan [{plan_id}] [{key}] to [{value}] \n Error: {e}")
-                return False
-
-        return True
     
     def add_user_plans(self, telegram_id, plan_id):
         cur = self.conn.cursor()
@@ -322,7 +674,7 @@ class UserDBManager:
         try:
             cur.execute("SELECT * FROM user_plans")
             rows = cur.fetchall()
-            rows = [dict(zip([key[0] for key in cur.description], row)) for row in rows]
+            rows = rows_to_dicts(cur, rows)
             return rows
         except Error as e:
             logging.error(f"Error while selecting all user_plans \n Error:{e}")
@@ -341,7 +693,7 @@ class UserDBManager:
             if len(rows) == 0:
                 logging.info(f"Plan {kwargs} not found!")
                 return None
-            rows = [dict(zip([key[0] for key in cur.description], row)) for row in rows]
+            rows = rows_to_dicts(cur, rows)
             return rows
         except Error as e:
             logging.error(f"Error while finding user_plans {kwargs} \n Error:{e}")
@@ -363,18 +715,8 @@ class UserDBManager:
             return False
 
     def edit_user_plans(self, user_plans_id, **kwargs):
-        cur = self.conn.cursor()
+        return self.update_row("user_plans", "id", user_plans_id, **kwargs)
 
-        for key, value in kwargs.items():
-            try:
-                cur.execute(f"UPDATE user_plans SET {key}=? WHERE id=?", (value, user_plans_id))
-                self.conn.commit()
-                logging.info(f"user_plans [{user_plans_id}] successfully update [{key}] to [{value}]")
-            except Error as e:
-                logging.error(f"Error while updating user_plans [{user_plans_id}] [{key}] to [{value}] \n Error: {e}")
-                return False
-
-        return True
     
     def add_order(self, order_id, telegram_id,user_name, plan_id, created_at):
         cur = self.conn.cursor()
@@ -395,7 +737,7 @@ class UserDBManager:
         try:
             cur.execute("SELECT * FROM orders")
             rows = cur.fetchall()
-            rows = [dict(zip([key[0] for key in cur.description], row)) for row in rows]
+            rows = rows_to_dicts(cur, rows)
             return rows
         except Error as e:
             logging.error(f"Error while selecting all orders \n Error:{e}")
@@ -414,25 +756,14 @@ class UserDBManager:
             if len(rows) == 0:
                 logging.info(f"Order {kwargs} not found!")
                 return None
-            rows = [dict(zip([key[0] for key in cur.description], row)) for row in rows]
+            rows = rows_to_dicts(cur, rows)
             return rows
         except Error as e:
             logging.error(f"Error while finding order {kwargs} \n Error:{e}")
             return None
 
     def edit_order(self, order_id, **kwargs):
-        cur = self.conn.cursor()
-
-        for key, value in kwargs.items():
-            try:
-                cur.execute(f"UPDATE orders SET {key}=? WHERE id=?", (value, order_id))
-                self.conn.commit()
-                logging.info(f"Order [{order_id}] successfully update [{key}] to [{value}]")
-            except Error as e:
-                logging.error(f"Error while updating order [{order_id}] [{key}] to [{value}] \n Error: {e}")
-                return False
-
-        return True
+        return self.update_row("orders", "id", order_id, **kwargs)
 
     def add_order_subscription(self, sub_id, order_id, uuid, server_id):
         cur = self.conn.cursor()
@@ -453,7 +784,7 @@ class UserDBManager:
         try:
             cur.execute("SELECT * FROM order_subscriptions")
             rows = cur.fetchall()
-            rows = [dict(zip([key[0] for key in cur.description], row)) for row in rows]
+            rows = rows_to_dicts(cur, rows)
             return rows
         except Error as e:
             logging.error(f"Error while selecting all orders \n Error:{e}")
@@ -472,25 +803,14 @@ class UserDBManager:
             if len(rows) == 0:
                 logging.info(f"Order {kwargs} not found!")
                 return None
-            rows = [dict(zip([key[0] for key in cur.description], row)) for row in rows]
+            rows = rows_to_dicts(cur, rows)
             return rows
         except Error as e:
             logging.error(f"Error while finding order {kwargs} \n Error:{e}")
             return None
 
     def edit_order_subscriptions(self, order_id, **kwargs):
-        cur = self.conn.cursor()
-
-        for key, value in kwargs.items():
-            try:
-                cur.execute(f"UPDATE order_subscriptions SET {key}=? WHERE order_id=?", (value, order_id))
-                self.conn.commit()
-                logging.info(f"Order [{order_id}] successfully update [{key}] to [{value}]")
-            except Error as e:
-                logging.error(f"Error while updating order [{order_id}] [{key}] to [{value}] \n Error: {e}")
-                return False
-
-        return True
+        return self.update_row("order_subscriptions", "order_id", order_id, **kwargs)
 
     def delete_order_subscription(self, **kwargs):
         cur = self.conn.cursor()
@@ -523,7 +843,7 @@ class UserDBManager:
         try:
             cur.execute("SELECT * FROM non_order_subscriptions")
             rows = cur.fetchall()
-            rows = [dict(zip([key[0] for key in cur.description], row)) for row in rows]
+            rows = rows_to_dicts(cur, rows)
             return rows
         except Error as e:
             logging.error(f"Error while selecting all orders \n Error:{e}")
@@ -542,12 +862,41 @@ class UserDBManager:
             if len(rows) == 0:
                 logging.info(f"Order {kwargs} not found!")
                 return None
-            rows = [dict(zip([key[0] for key in cur.description], row)) for row in rows]
+            rows = rows_to_dicts(cur, rows)
             return rows
         except Error as e:
             logging.error(f"Error while finding order {kwargs} \n Error:{e}")
             return None
 
+    def find_user_subscriptions(self, telegram_id=None):
+        # Subscriptions (ordered and linked) with their server - one query, all users if telegram_id is None
+        cur = self.conn.cursor()
+        order_filter = " WHERE orders.telegram_id=?" if telegram_id is not None else ""
+        non_order_filter = " WHERE non_order_subscriptions.telegram_id=?" if telegram_id is not None else ""
+        params = (telegram_id, telegram_id) if telegram_id is not None else ()
+        try:
+            cur.execute("SELECT 'order' AS sub_type, order_subscriptions.id AS sub_id, order_subscriptions.uuid,"
+                        " order_subscriptions.server_id, servers.url, servers.title, orders.telegram_id,"
+                        " orders.id AS order_id"
+                        " FROM orders"
+                        " JOIN order_subscriptions ON order_subscriptions.order_id = orders.id"
+                        " JOIN servers ON servers.id = order_subscriptions.server_id"
+                        f"{order_filter}"
+                        " UNION ALL "
+                        "SELECT 'non_order' AS sub_type, non_order_subscriptions.id AS sub_id,"
+                        " non_order_subscriptions.uuid, non_order_subscriptions.server_id, servers.url, servers.title,"
+                        " non_order_subscriptions.telegram_id, NULL AS order_id"
+                        " FROM non_order_subscriptions"
+                        " JOIN servers ON servers.id = non_order_subscriptions.server_id"
+                        f"{non_order_filter}"
+                        " ORDER BY telegram_id, sub_type, order_id, sub_id", params)
+            rows = cur.fetchall()
+            rows = rows_to_dicts(cur, rows)
+            return rows
+        except Error as e:
+            logging.error(f"Error while finding subscriptions of user [{telegram_id}] \n Error:{e}")
+            return None
+
     def delete_non_order_subscription(self, **kwargs):
         cur = self.conn.cursor()
         try:
@@ -561,17 +910,9 @@ class UserDBManager:
             return False
 
     def edit_bool_config(self, key_row, **kwargs):
-        cur = self.conn.cursor()
-        for key, value in kwargs.items():
-            try:
-                cur.execute(f"UPDATE bool_config SET {key}=? WHERE key=?", (value, key_row))
-                self.conn.commit()
-                logging.info(f"Settings [{key}] successfully update [{key}] to [{value}]")
-            except Error as e:
-                logging.error(f"Error while updating settings [{key}] [{key}] to [{value}] \n Error: {e}")
-                return False
-
-        return True
+        status = self.update_row("bool_config", "key", key_row, **kwargs)
+        self.config_version += 1
+        return status
 
     def find_bool_config(self, **kwargs):
         if len(kwargs) != 1:
@@ -586,7 +927,7 @@ class UserDBManager:
             if len(rows) == 0:
                 logging.info(f"Settings {kwargs} not found!")
                 return None
-            rows = [dict(zip([key[0] for key in cur.description], row)) for row in rows]
+            rows = rows_to_dicts(cur, rows)
             return rows
         except Error as e:
             logging.error(f"Error while finding settings {kwargs} \n Error:{e}")
@@ -599,6 +940,7 @@ class UserDBManager:
                 "INSERT or IGNORE INTO bool_config(key,value) VALUES(?,?)",
                 (key, value))
             self.conn.commit()
+            self.config_version += 1
             logging.info(f"Settings [{key}] added successfully!")
             return True
         except Error as e:
@@ -613,7 +955,7 @@ class UserDBManager:
         try:
             cur.execute("SELECT * FROM bool_config")
             rows = cur.fetchall()
-            rows = [dict(zip([key[0] for key in cur.description], row)) for row in rows]
+            rows = rows_to_dicts(cur, rows)
             return rows
         except Error as e:
             logging.error(f"Error while selecting all settings \n Error:{e}")
@@ -624,7 +966,7 @@ class UserDBManager:
         try:
             cur.execute("SELECT * FROM str_config")
             rows = cur.fetchall()
-            rows = [dict(zip([key[0] for key in cur.description], row)) for row in rows]
+            rows = rows_to_dicts(cur, rows)
             return rows
         except Error as e:
             logging.error(f"Error while selecting all settings \n Error:{e}")
@@ -643,24 +985,16 @@ class UserDBManager:
             if len(rows) == 0:
                 logging.info(f"Settings {kwargs} not found!")
                 return None
-            rows = [dict(zip([key[0] for key in cur.description], row)) for row in rows]
+            rows = rows_to_dicts(cur, rows)
             return rows
         except Error as e:
             logging.error(f"Error while finding settings {kwargs} \n Error:{e}")
             return None
 
     def edit_str_config(self, key_row, **kwargs):
-        cur = self.conn.cursor()
-        for key, value in kwargs.items():
-            try:
-                cur.execute(f"UPDATE str_config SET {key}=? WHERE key=?", (value, key_row))
-                self.conn.commit()
-                logging.info(f"Settings [{key}] successfully update [{key}] to [{value}]")
-            except Error as e:
-                logging.error(f"Error while updating settings [{key}] [{key}] to [{value}] \n Error: {e}")
-                return False
-
-        return True
+        status = self.update_row("str_config", "key", key_row, **kwargs)
+        self.config_version += 1
+        return status
 
     def add_str_config(self, key, value):
         cur = self.conn.cursor()
@@ -669,6 +1003,7 @@ class UserDBManager:
                 "INSERT or IGNORE INTO str_config(key,value) VALUES(?,?)",
                 (key, value))
             self.conn.commit()
+            self.config_version += 1
             logging.info(f"Settings [{key}] added successfully!")
             return True
         except Error as e:
@@ -682,7 +1017,7 @@ class UserDBManager:
         try:
             cur.execute("SELECT * FROM int_config")
             rows = cur.fetchall()
-            rows = [dict(zip([key[0] for key in cur.description], row)) for row in rows]
+            rows = rows_to_dicts(cur, rows)
             return rows
         except Error as e:
             logging.error(f"Error while selecting all settings \n Error:{e}")
@@ -701,23 +1036,15 @@ class UserDBManager:
             if len(rows) == 0:
                 logging.info(f"Settings {kwargs} not found!")
                 return None
-            rows = [dict(zip([key[0] for key in cur.description], row)) for row in rows]
+            rows = rows_to_dicts(cur, rows)
             return rows
         except Error as e:
             logging.error(f"Error while finding settings {kwargs} \n Error:{e}")
             return None
     def edit_int_config(self, key_row, **kwargs):
-        cur = self.conn.cursor()
-        for key, value in kwargs.items():            
-            try:
-                cur.execute(f"UPDATE int_config SET {key}=? WHERE key=?", (value, key_row))
-                self.conn.commit()
-                logging.info(f"Settings [{key}] successfully update [{key}] to [{value}]")
-            except Error as e:
-                logging.error(f"Error while updating settings [{key}] [{key}] to [{value}] \n Error: {e}")
-                return False
-
-        return True
+        status = self.update_row("int_config", "key", key_row, **kwargs)
+        self.config_version += 1
+        return status
 
     def add_int_config(self, key, value):
         cur = self.conn.cursor()
@@ -726,6 +1053,7 @@ class UserDBManager:
                 "INSERT or IGNORE INTO int_config(key,value) VALUES(?,?)",
                 (key, value))
             self.conn.commit()
+            self.config_version += 1
             logging.info(f"Settings [{key}] added successfully!")
             return True
         except Error as e:
@@ -761,6 +1089,7 @@ class UserDBManager:
         self.add_str_config("bot_token_admin", None)
         self.add_str_config("bot_token_client", None)
         self.add_str_config("bot_lang", None)
+        self.add_str_config("bot_runtime", None)
 
         self.add_str_config("card_number", None)
         self.add_str_config("card_holder", None)
@@ -810,7 +1139,7 @@ class UserDBManager:
         try:
             cur.execute("SELECT * FROM wallet")
             rows = cur.fetchall()
-            rows = [dict(zip([key[0] for key in cur.description], row)) for row in rows]
+            rows = rows_to_dicts(cur, rows)
             return rows
         except Error as e:
             logging.error(f"Error while selecting all balance \n Error:{e}")
@@ -829,22 +1158,54 @@ class UserDBManager:
             if len(rows) == 0:
                 logging.info(f"Balance {kwargs} not found!")
                 return None
-            rows = [dict(zip([key[0] for key in cur.description], row)) for row in rows]
+            rows = rows_to_dicts(cur, rows)
             return rows
         except Error as e:
             logging.error(f"Error while finding balance {kwargs} \n Error:{e}")
             return None
 
     def edit_wallet(self, telegram_id, **kwargs):
-        cur = self.conn.cursor()
+        return self.update_row("wallet", "telegram_id", telegram_id, **kwargs)
+
+    # Add amount (negative to spend) to balance - computed in SQL, so concurrent changes are not lost
+    def change_wallet_balance(self, telegram_id, amount):
         try:
-            for key, value in kwargs.items():
-                cur.execute(f"UPDATE wallet SET {key}=? WHERE telegram_id=?", (value, telegram_id,))
-                self.conn.commit()
-                logging.info(f"balance successfully update [{key}] to [{value}]")
+            with self.conn:
+                cur = self.conn.execute("UPDATE wallet SET balance = balance + ? WHERE telegram_id=?",
+                                        (int(amount), telegram_id))
+            if not cur.rowcount:
+                logging.error(f"Error while changing balance [{telegram_id}] - wallet not found")
+                return False
+            logging.info(f"Balance [{telegram_id}] successfully changed by {amount}")
             return True
         except Error as e:
-            logging.error(f"Error while updating balance [{key}] to [{value}] \n Error: {e}")
+            logging.error(f"Error while changing balance [{telegram_id}] \n Error: {e}")
+            return False
+
+    # Approve payment and charge wallet (approved=True), or disapprove an approved payment and take its
+    # amount back (approved=False), in one transaction.
+    # Return False if payment is not in the expected status, so the wallet is never charged twice
+    def set_payment_approval(self, payment_id, approved):
+        try:
+            with self.conn:
+                if approved:
+                    cur = self.conn.execute("UPDATE payments SET approved=1 WHERE id=? AND approved IS NOT 1",
+                                            (payment_id,))
+                else:
+                    cur = self.conn.execute("UPDATE payments SET approved=0 WHERE id=? AND approved IS 1",
+                                            (payment_id,))
+                if not cur.rowcount:
+                    logging.warning(f"Payment [{payment_id}] approval is already {approved}")
+                    return False
+                row = self.conn.execute("SELECT telegram_id, payment_amount FROM payments WHERE id=?",
+                                        (payment_id,)).fetchone()
+                amount = int(row[1]) if approved else -int(row[1])
+                self.conn.execute("INSERT OR IGNORE INTO wallet(telegram_id) VALUES(?)", (row[0],))
+                self.conn.execute("UPDATE wallet SET balance = balance + ? WHERE telegram_id=?", (amount, row[0]))
+            logging.info(f"Payment [{payment_id}] approved={approved}, balance [{row[0]}] changed by {amount}")
+            return True
+        except Error as e:
+            logging.error(f"Error while setting approval of payment [{payment_id}] \n Error: {e}")
             return False
 
     def add_payment(self, payment_id, telegram_id, payment_amount, payment_method, payment_image, created_at):
@@ -862,16 +1223,10 @@ class UserDBManager:
             return False
 
     def edit_payment(self, payment_id, **kwargs):
-        cur = self.conn.cursor()
-        try:
-            for key, value in kwargs.items():
-                cur.execute(f"UPDATE payments SET {key}=? WHERE id=?", (value, payment_id))
-                self.conn.commit()
-                logging.info(f"payment successfully update [{key}] to [{value}]")
-            return True
-        except Error as e:
-            logging.error(f"Error while updating payment [{key}] to [{value}] \n Error: {e}")
-            return False
+        return self.update_row("payments", "id", payment_id, **kwargs)
+
+    def iter_payments(self):
+        return self.iter_rows("payments")
 
     def find_payment(self, **kwargs):
         if len(kwargs) != 1:
@@ -886,7 +1241,7 @@ class UserDBManager:
             if len(rows) == 0:
                 logging.info(f"Payment {kwargs} not found!")
                 return None
-            rows = [dict(zip([key[0] for key in cur.description], row)) for row in rows]
+            rows = rows_to_dicts(cur, rows)
             return rows
         except Error as e:
             logging.error(f"Error while finding payment {kwargs} \n Error:{e}")
@@ -897,7 +1252,7 @@ class UserDBManager:
         try:
             cur.execute("SELECT * FROM payments")
             rows = cur.fetchall()
-            rows = [dict(zip([key[0] for key in cur.description], row)) for row in rows]
+            rows = rows_to_dicts(cur, rows)
             return rows
         except Error as e:
             logging.error(f"Error while selecting all payments \n Error:{e}")
@@ -908,7 +1263,7 @@ class UserDBManager:
         try:
             cur.execute("SELECT * FROM servers")
             rows = cur.fetchall()
-            rows = [dict(zip([key[0] for key in cur.description], row)) for row in rows]
+            rows = rows_to_dicts(cur, rows)
             return rows
         except Error as e:
             logging.error(f"Error while selecting all servers \n Error:{e}")
@@ -928,16 +1283,8 @@ class UserDBManager:
             return False
     
     def edit_server(self, server_id, **kwargs):
-        cur = self.conn.cursor()
-        try:
-            for key, value in kwargs.items():
-                cur.execute(f"UPDATE servers SET {key}=? WHERE id=?", (value, server_id))
-                self.conn.commit()
-                logging.info(f"Server [{server_id}] successfully update [{key}] to [{value}]")
-            return True
-        except Error as e:
-            logging.error(f"Error while updating server [{server_id}] [{key}] to [{value}] \n Error: {e}")
-            return False
+        return self.update_row("servers", "id", server_id, **kwargs)
+
     
     def find_server(self, **kwargs):
         if len(kwargs) != 1:
@@ -952,7 +1299,7 @@ class UserDBManager:
             if len(rows) == 0:
                 logging.info(f"Server {kwargs} not found!")
                 return None
-            rows = [dict(zip([key[0] for key in cur.description], row)) for row in rows]
+            rows = rows_to_dicts(cur, rows)
             return rows
         except Error as e:
             logging.error(f"Error while finding server {kwargs} \n Error:{e}")
@@ -974,25 +1321,258 @@ class UserDBManager:
             return False
         
     
+    def add_sent_reminder(self, telegram_id, sub_id, alert_type, sent_at):
+        cur = self.conn.cursor()
+        try:
+            cur.execute("INSERT OR IGNORE INTO sent_reminders(telegram_id,sub_id,alert_type,sent_at) VALUES(?,?,?,?)",
+                        (telegram_id, sub_id, alert_type, sent_at))
+            self.conn.commit()
+            return True
+        except Error as e:
+            logging.error(f"Error while adding sent reminder [{telegram_id}] [{sub_id}] \n Error: {e}")
+            return False
+
+    def find_sent_reminder(self, **kwargs):
+        if len(kwargs) != 1:
+            logging.warning("You can only use one key to find sent reminder!")
+            return None
+        rows = []
+        cur = self.conn.cursor()
+        try:
+            for key, value in kwargs.items():
+                cur.execute(f"SELECT * FROM sent_reminders WHERE {key}=?", (value,))
+                rows = cur.fetchall()
+            if len(rows) == 0:
+                return None
+            rows = rows_to_dicts(cur, rows)
+            return rows
+        except Error as e:
+            logging.error(f"Error while finding sent reminder {kwargs} \n Error:{e}")
+            return None
+
+    def delete_sent_reminders_before(self, sent_at):
+        cur = self.conn.cursor()
+        try:
+            cur.execute("DELETE FROM sent_reminders WHERE sent_at<?", (sent_at,))
+            self.conn.commit()
+            return True
+        except Error as e:
+            logging.error(f"Error while deleting sent reminders before [{sent_at}] \n Error: {e}")
+            return False
+
+    def add_broadcast(self, admin_id, message, total, created_at):
+        cur = self.conn.cursor()
+        try:
+            cur.execute("INSERT INTO broadcasts(admin_id,message,total,created_at) VALUES(?,?,?,?)",
+                        (admin_id, message, total, created_at))
+            self.conn.commit()
+            logging.info(f"Broadcast [{cur.lastrowid}] added successfully!")
+            return cur.lastrowid
+        except Error as e:
+            logging.error(f"Error while adding broadcast \n Error: {e}")
+            return None
+
+    def edit_broadcast(self, broadcast_id, **kwargs):
+        return self.update_row("broadcasts", "id", broadcast_id, **kwargs)
+
+    # Record that broadcast reached (or failed for) a user - resumed broadcasts skip recorded users
+    def add_broadcast_recipient(self, broadcast_id, user_id, sent):
+        cur = self.conn.cursor()
+        try:
+            cur.execute("INSERT OR REPLACE INTO broadcast_recipients(broadcast_id,user_id,sent) VALUES(?,?,?)",
+                        (broadcast_id, user_id, sent))
+            self.conn.commit()
+            return True
+        except Error as e:
+            logging.error(f"Error while adding broadcast [{broadcast_id}] recipient [{user_id}] \n Error: {e}")
+            return False
+
+    # Users not reached by broadcast yet, in id order
+    def select_broadcast_pending_users(self, broadcast_id):
+        cur = self.conn.cursor()
+        try:
+            cur.execute("SELECT * FROM users WHERE id NOT IN "
+                        "(SELECT user_id FROM broadcast_recipients WHERE broadcast_id=?) ORDER BY id",
+                        (broadcast_id,))
+            rows = cur.fetchall()
+            return rows_to_dicts(cur, rows)
+        except Error as e:
+            logging.error(f"Error while selecting pending users of broadcast [{broadcast_id}] \n Error:{e}")
+            return None
+
+    # (sent, failed) recipients of broadcast
+    def count_broadcast_recipients(self, broadcast_id):
+        cur = self.conn.cursor()
+        try:
+            cur.execute("SELECT COALESCE(SUM(sent), 0), COUNT(*) FROM broadcast_recipients WHERE broadcast_id=?",
+                        (broadcast_id,))
+            sent, total = cur.fetchone()
+            return sent, total - sent
+        except Error as e:
+            logging.error(f"Error while counting recipients of broadcast [{broadcast_id}] \n Error:{e}")
+            return None
+
+    def find_broadcast(self, **kwargs):
+        if len(kwargs) != 1:
+            logging.warning("You can only use one key to find broadcast!")
+            return None
+        rows = []
+        cur = self.conn.cursor()
+        try:
+            for key, value in kwargs.items():
+                cur.execute(f"SELECT * FROM broadcasts WHERE {key}=?", (value,))
+                rows = cur.fetchall()
+            if len(rows) == 0:
+                logging.info(f"Broadcast {kwargs} not found!")
+                return None
+            rows = rows_to_dicts(cur, rows)
+            return rows
+        except Error as e:
+            logging.error(f"Error while finding broadcast {kwargs} \n Error:{e}")
+            return None
+
+    def set_admin_session(self, chat_id, data):
+        cur = self.conn.cursor()
+        try:
+            cur.execute("INSERT OR REPLACE INTO admin_sessions(chat_id,data,updated_at) VALUES(?,?,?)",
+                        (chat_id, data, datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
+            self.conn.commit()
+            return True
+        except Error as e:
+            logging.error(f"Error while saving admin session [{chat_id}] \n Error: {e}")
+            return False
+
+    def find_admin_session(self, chat_id):
+        cur = self.conn.cursor()
+        try:
+            cur.execute("SELECT data FROM admin_sessions WHERE chat_id=?", (chat_id,))
+            row = cur.fetchone()
+            return row[0] if row else None
+        except Error as e:
+            logging.error(f"Error while finding admin session [{chat_id}] \n Error:{e}")
+            return None
+
+    # Apply panel users list to mirror - users: {uuid: (name, data)}, return (changed, deleted) count
+    def sync_panel_users(self, url, users, synced_at):
+        cur = self.conn.cursor()
+        try:
+            cur.execute("SELECT uuid, data FROM panel_users WHERE url=?", (url,))
+            current = dict(cur.fetchall())
+            changed = [(url, uuid, name, data) for uuid, (name, data) in users.items() if current.get(uuid) != data]
+            deleted = [(url, uuid) for uuid in current if uuid not in users]
+            cur.executemany("INSERT OR REPLACE INTO panel_users(url,uuid,name,data) VALUES(?,?,?,?)", changed)
+            cur.executemany("DELETE FROM panel_users WHERE url=? AND uuid=?", deleted)
+            cur.execute("INSERT OR REPLACE INTO panel_sync(url,synced_at,users) VALUES(?,?,?)",
+                        (url, synced_at, len(users)))
+            self.conn.commit()
+            return len(changed), len(deleted)
+        except Error as e:
+            self.conn.rollback()
+            logging.error(f"Error while syncing panel users \n Error: {e}")
+            return None
+
+    def set_panel_user(self, url, uuid, name, data):
+        cur = self.conn.cursor()
+        try:
+            cur.execute("INSERT OR REPLACE INTO panel_users(url,uuid,name,data) VALUES(?,?,?,?)",
+                        (url, uuid, name, data))
+            self.conn.commit()
+            return True
+        except Error as e:
+            logging.error(f"Error while saving panel user [{uuid}] \n Error: {e}")
+            return False
+
+    # Users data of panel in mirror
+    def select_panel_users(self, url):
+        cur = self.conn.cursor()
+        try:
+            cur.execute("SELECT data FROM panel_users WHERE url=?", (url,))
+            return [row[0] for row in cur.fetchall()]
+        except Error as e:
+            logging.error(f"Error while selecting panel users \n Error:{e}")
+            return None
+
+    def find_panel_user(self, url, uuid):
+        cur = self.conn.cursor()
+        try:
+            cur.execute("SELECT data FROM panel_users WHERE url=? AND uuid=?", (url, uuid))
+            row = cur.fetchone()
+            return row[0] if row else None
+        except Error as e:
+            logging.error(f"Error while finding panel user [{uuid}] \n Error:{e}")
+            return None
+
+    def select_panel_sync(self):
+        cur = self.conn.cursor()
+        try:
+            cur.execute("SELECT * FROM panel_sync")
+            rows = cur.fetchall()
+            return rows_to_dicts(cur, rows)
+        except Error as e:
+            logging.error(f"Error while selecting panel sync \n Error:{e}")
+            return None
+
+    def find_panel_sync(self, url):
+        cur = self.conn.cursor()
+        try:
+            cur.execute("SELECT synced_at FROM panel_sync WHERE url=?", (url,))
+            row = cur.fetchone()
+            return row[0] if row else None
+        except Error as e:
+            logging.error(f"Error while finding panel sync \n Error:{e}")
+            return None
+
+    # Write pending handlers of bot in one transaction - saved: [(chat_id, handlers, expires_at)], deleted: [chat_id]
+    def save_next_step_handlers(self, bot, saved, deleted, now):
+        cur = self.conn.cursor()
+        try:
+            cur.executemany("INSERT OR REPLACE INTO next_step_handlers(bot,chat_id,handlers,expires_at) VALUES(?,?,?,?)",
+                            [(bot, chat_id, handlers, expires_at) for chat_id, handlers, expires_at in saved])
+            cur.executemany("DELETE FROM next_step_handlers WHERE bot=? AND chat_id=?",
+                            [(bot, chat_id) for chat_id in deleted])
+            cur.execute("DELETE FROM next_step_handlers WHERE bot=? AND expires_at<?", (bot, now))
+            self.conn.commit()
+            return True
+        except Error as e:
+            self.conn.rollback()
+            logging.error(f"Error while saving next step handlers of {bot} \n Error: {e}")
+            return False
+
+    # Pending handlers of bot not expired at now - [(chat_id, handlers, expires_at)]
+    def select_next_step_handlers(self, bot, now):
+        cur = self.conn.cursor()
+        try:
+            cur.execute("SELECT chat_id, handlers, expires_at FROM next_step_handlers WHERE bot=? AND expires_at>=?",
+                        (bot, now))
+            return cur.fetchall()
+        except Error as e:
+            logging.error(f"Error while selecting next step handlers of {bot} \n Error:{e}")
+            return None
+
+    # Consistent copy of database to file (includes rows still in WAL file)
+    def backup_to_file(self, file):
+        try:
+            target = sqlite3.connect(file)
+            with target:
+                self.conn.backup(target)
+            target.close()
+            return file
+        except Error as e:
+            logging.error(f"Error while backup database to {file} \n Error:{e}")
+            return False
+
     def backup_to_json(self, backup_dir):
         try:
 
             backup_data = {}  # Store backup data in a dictionary
 
-            # List of tables to backup
-            tables = ['users', 'plans', 'orders', 'order_subscriptions', 'non_order_subscriptions',
-                      'str_config', 'int_config', 'bool_config', 'wallet', 'payments', 'servers']
-
-            for table in tables:
+            for table in BACKUP_TABLES:
                 cur = self.conn.cursor()
                 cur.execute(f"SELECT * FROM {table}")
                 rows = cur.fetchall()
 
                 # Convert rows to list of dictionaries
-                table_data = []
-                for row in rows:
-                    columns = [column[0] for column in cur.description]
-                    table_data.append(dict(zip(columns, row)))
+                table_data = rows_to_dicts(cur, rows)
 
                 backup_data[table] = table_data
             return backup_data
@@ -1031,7 +1611,9 @@ class UserDBManager:
             self.conn.execute('BEGIN TRANSACTION')
 
             for table, data in backup_data.items():
-                if table == 'version':
+                if table not in BACKUP_TABLES:
+                    if table != 'version':
+                        logging.warning(f"Skipping {table} - not a backup table")
                     continue
                 logging.info(f"Restoring table {table}...")
                 for entry in data:
@@ -1055,6 +1637,8 @@ class UserDBManager:
                         print('Entry:', entry)
 
             self.conn.commit()
+            self.config_version += 1
+            self.invalidate_user_sets()
             logging.info('Database restored successfully.')
             return True
 
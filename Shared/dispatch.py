@@ -0,0 +1,67 @@
+# Description: Callback query dispatch - callback data key (before ':') is mapped to its handler function.
+# Calls, errors and latency are counted per key; a key can limit how many of its calls run at the same time.
+import logging
+import threading
+import time
+
+
+class CallbackRegistry:
+    def __init__(self, name):
+        self.name = name
+        self.handlers = {}
+        self.limits = {}
+        self.stats = {}
+        self.lock = threading.Lock()
+
+    # Decorator - register handler for keys, max_concurrent limits parallel calls of the handler
+    def register(self, *keys, max_concurrent=None):
+        def decorator(handler):
+            limit = threading.BoundedSemaphore(max_concurrent) if max_concurrent else None
+            for key in keys:
+                if key in self.handlers:
+                    raise ValueError(f"Callback key {key} of {self.name} is already registered")
+                self.handlers[key] = handler
+                self.limits[key] = limit
+                self.stats[key] = {'calls': 0, 'errors': 0, 'total_ms': 0.0, 'max_ms': 0.0}
+            return handler
+        return decorator
+
+    # Run handler of key - return False if key has no handler
+    def dispatch(self, key, *args):
+        handler = self.handlers.get(key)
+        if not handler:
+            logging.warning(f"{self.name} - no callback handler for key {key}")
+            return False
+        limit = self.limits[key]
+        start = time.perf_counter()
+        failed = False
+        try:
+            if limit:
+                with limit:
+                    handler(*args)
+            else:
+                handler(*args)
+        except Exception:
+            failed = True
+            raise
+        finally:
+            elapsed = (time.perf_counter() - start) * 1000
+            with self.lock:
+                stats = self.stats[key]
+                stats['calls'] += 1
+                stats['errors'] += failed
+                stats['total_ms'] += elapsed
+                stats['max_ms'] = max(stats['max_ms'], elapsed)
+        return True
+
+    # Stats of called keys - {key: {calls, errors, avg_ms, max_ms}}
+    def stats_snapshot(self):
+        with self.lock:
+            return {key: {'calls': stats['calls'], 'errors': stats['errors'],
+                          'avg_ms': round(stats['total_ms'] / stats['calls'], 2),
+                          'max_ms': round(stats['max_ms'], 2)}
+                    for key, stats in self.stats.items() if stats['calls']}
+
+
+admin_callbacks = CallbackRegistry("AdminBot")
+user_callbacks = CallbackRegistry("UserBot")
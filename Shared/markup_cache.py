@@ -0,0 +1,40 @@
+# Description: Cache of static keyboards - a markup is built once and kept as serialized JSON,
+# so it is neither rebuilt nor serialized again on every send.
+# Key is (function, arguments, language); markups that read settings are rebuilt after a settings change.
+import functools
+from telebot.types import JsonSerializable
+from Database.dbManager import USERS_DB
+from config import LANG
+
+
+# Pre-serialized markup - accepted by telebot wherever a markup is (reply_markup is sent as to_json())
+class SerializedMarkup(JsonSerializable):
+    def __init__(self, markup):
+        self.json = markup.to_json()
+
+    def to_json(self):
+        return self.json
+
+
+# {(function, args, kwargs, language): (settings version, SerializedMarkup)}
+markups_cache = {}
+
+
+# Decorator - arguments must be hashable, settings=True if markup depends on bot settings (all_configs_settings)
+def cached_markup(settings=False):
+    def decorator(build):
+        @functools.wraps(build)
+        def wrapper(*args, **kwargs):
+            key = (build.__module__, build.__name__, args, tuple(sorted(kwargs.items())), LANG)
+            version = USERS_DB.config_version if settings else None
+            cached = markups_cache.get(key)
+            if cached and cached[0] == version:
+                return cached[1]
+            markup = build(*args, **kwargs)
+            if markup is None:
+                return None
+            markup = SerializedMarkup(markup)
+            markups_cache[key] = (version, markup)
+            return markup
+        return wrapper
+    return decorator
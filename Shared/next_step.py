@@ -0,0 +1,132 @@
+# Description: Next step handlers store of bots - pending handlers are kept in memory per chat
+# and written to database in batches (only changed chats), instead of rewriting a pickle file on every register.
+# Memory is bounded (least recently used chats are dropped) and abandoned flows expire.
+import atexit
+import logging
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from telebot.handler_backends import HandlerBackend
+from Database.dbManager import USERS_DB
+from config import NEXT_STEP_HANDLERS_SIZE, NEXT_STEP_HANDLERS_TTL, NEXT_STEP_HANDLERS_FLUSH_DELAY
+
+
+class NextStepStore(HandlerBackend):
+    def __init__(self, name, size=NEXT_STEP_HANDLERS_SIZE, ttl=NEXT_STEP_HANDLERS_TTL,
+                 delay=NEXT_STEP_HANDLERS_FLUSH_DELAY):
+        # {chat_id: [expires_at, handlers]} - least recently registered first
+        super().__init__(OrderedDict())
+        self.name = name
+        self.size = size
+        self.ttl = ttl
+        self.delay = delay
+        # Chats changed since last flush
+        self.dirty = set()
+        self.lock = threading.Lock()
+        self.timer = None
+        atexit.register(self.flush)
+
+    def register_handler(self, handler_group_id, handler):
+        with self.lock:
+            entry = self.handlers.get(handler_group_id)
+            if entry is None or entry[0] < time.time():
+                entry = [0, []]
+                self.handlers[handler_group_id] = entry
+            entry[0] = time.time() + self.ttl
+            entry[1].append(handler)
+            self.handlers.move_to_end(handler_group_id)
+            self.dirty.add(handler_group_id)
+            while len(self.handlers) > self.size:
+                chat_id, _ = self.handlers.popitem(last=False)
+                self.dirty.add(chat_id)
+                logging.warning(f"{self.name} - next step handlers of chat {chat_id} dropped, store is full")
+        self.start_flush_timer()
+
+    def clear_handlers(self, handler_group_id):
+        with self.lock:
+            if self.handlers.pop(handler_group_id, None) is None:
+                return
+            self.dirty.add(handler_group_id)
+        self.start_flush_timer()
+
+    # Pending handlers of chat, removed from store - None if there is none or they are expired
+    def get_handlers(self, handler_group_id):
+        with self.lock:
+            entry = self.handlers.pop(handler_group_id, None)
+            if entry is None:
+                return None
+            self.dirty.add(handler_group_id)
+        self.start_flush_timer()
+        if entry[0] < time.time():
+            return None
+        return entry[1]
+
+    def start_flush_timer(self):
+        with self.lock:
+            if self.timer and self.timer.is_alive():
+                return
+            self.timer = threading.Timer(self.delay, self.flush_on_timer)
+            self.timer.daemon = True
+            self.timer.start()
+
+    # Timer is alive while flushing - chats changed meanwhile (or a failed flush) need a new timer
+    def flush_on_timer(self):
+        try:
+            self.flush()
+        finally:
+            with self.lock:
+                self.timer = None
+                pending = bool(self.dirty)
+            if pending:
+                self.start_flush_timer()
+
+    # Write changed chats to database and drop expired ones from memory
+    def flush(self):
+        now = time.time()
+        saved = []
+        deleted = []
+        with self.lock:
+            for chat_id in [chat_id for chat_id, entry in self.handlers.items() if entry[0] < now]:
+                del self.handlers[chat_id]
+                self.dirty.add(chat_id)
+            dirty, self.dirty = self.dirty, set()
+            for chat_id in dirty:
+                entry = self.handlers.get(chat_id)
+                if entry is None:
+                    deleted.append(chat_id)
+                    continue
+                try:
+                    saved.append((chat_id, pickle.dumps(entry[1]), entry[0]))
+                except (pickle.PicklingError, AttributeError, TypeError) as e:
+                    # Kept in memory only - lost on restart
+                    logging.warning(f"{self.name} - next step handlers of chat {chat_id} can't be saved: {e}")
+                    deleted.append(chat_id)
+        if not saved and not deleted:
+            return True
+        if not USERS_DB.save_next_step_handlers(self.name, saved, deleted, now):
+            # Retry with next flush
+            with self.lock:
+                self.dirty.update(chat_id for chat_id, _, _ in saved)
+                self.dirty.update(deleted)
+            return False
+        return True
+
+    # Load pending handlers saved before restart - arguments are kept for TeleBot.load_next_step_handlers
+    def load_handlers(self, filename=None, del_file_after_loading=True):
+        rows = USERS_DB.select_next_step_handlers(self.name, time.time())
+        if not rows:
+            return
+        loaded = 0
+        with self.lock:
+            for chat_id, data, expires_at in sorted(rows, key=lambda row: row[2]):
+                try:
+                    handlers = pickle.loads(data)
+                except Exception as e:
+                    logging.warning(f"{self.name} - invalid next step handlers of chat {chat_id}: {e}")
+                    self.dirty.add(chat_id)
+                    continue
+                entry = self.handlers.setdefault(chat_id, [expires_at, []])
+                entry[1][:0] = handlers
+                loaded += 1
+        logging.info(f"{self.name} - next step handlers of {loaded} chats loaded")
@@ -0,0 +1,82 @@
+# Description: Asyncio runtime - long polling of all bots in one event loop.
+# Handlers stay synchronous and run in a bounded worker pool, so a slow panel call
+# only holds one worker instead of the whole bot. Updates of one chat are handled in order.
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from config import ASYNC_HANDLER_WORKERS, ASYNC_POLLING_TIMEOUT
+
+
+# Chat of update - None if update has no chat (handled without ordering)
+def update_chat_id(update):
+    for message in (update.message, update.edited_message, update.channel_post, update.edited_channel_post):
+        if message:
+            return message.chat.id
+    if update.callback_query:
+        return update.callback_query.from_user.id
+    if update.my_chat_member:
+        return update.my_chat_member.chat.id
+    if update.chat_member:
+        return update.chat_member.chat.id
+    return None
+
+
+# Run handlers of update in worker pool - wait for previous updates of the same chat
+async def handle_update(bot, update, executor, chat_locks):
+    loop = asyncio.get_running_loop()
+    key = (bot.token, update_chat_id(update))
+    # chat_locks - {key: [lock, pending updates]}
+    chat_lock = chat_locks.setdefault(key, [asyncio.Lock(), 0])
+    chat_lock[1] += 1
+    try:
+        async with chat_lock[0]:
+            await loop.run_in_executor(executor, bot.process_new_updates, [update])
+    except Exception as e:
+        logging.error(f"Error while handling update {update.update_id} \n Error:{e}")
+    finally:
+        chat_lock[1] -= 1
+        if chat_lock[1] == 0:
+            chat_locks.pop(key, None)
+
+
+# Long polling of one bot - stop fetching while too many updates are pending
+async def poll_bot(bot, executor, chat_locks, max_pending):
+    loop = asyncio.get_running_loop()
+    pending = asyncio.Semaphore(max_pending)
+    tasks = set()
+    offset = None
+    logging.info(f"Asyncio polling started for bot {bot.token.split(':')[0]}")
+    while True:
+        try:
+            updates = await loop.run_in_executor(
+                None, lambda: bot.get_updates(offset=offset, timeout=ASYNC_POLLING_TIMEOUT + 10,
+                                              long_polling_timeout=ASYNC_POLLING_TIMEOUT))
+        except Exception as e:
+            logging.error(f"Error while getting updates \n Error:{e}")
+            await asyncio.sleep(3)
+            continue
+        for update in updates:
+            offset = update.update_id + 1
+            await pending.acquire()
+            task = asyncio.create_task(handle_update(bot, update, executor, chat_locks))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+            task.add_done_callback(lambda _: pending.release())
+
+
+# Run all bots in one event loop - call setup() of each bot before
+async def run_bots(bots, workers=ASYNC_HANDLER_WORKERS):
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="handler")
+    chat_locks = {}
+    for bot in bots:
+        # handlers run in our worker pool, not in the bot's own threads
+        bot.threaded = False
+    try:
+        await asyncio.gather(*(poll_bot(bot, executor, chat_locks, workers * 4) for bot in bots))
+    finally:
+        executor.shutdown(wait=False)
+
+
+# Blocking entry point of asyncio runtime
+def start(bots):
+    asyncio.run(run_bots(bots))
@@ -0,0 +1,114 @@
+# Description: Webhook runtime - one HTTP server for all bots, each bot on its own path.
+# Updates are queued to a bounded pool of workers; a full queue answers 503 so Telegram retries later.
+# Local test: POST a recorded Update JSON to http://<listen>:<port>/<bot token>
+import json
+import logging
+import queue
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import telebot
+from config import WEBHOOK_URL, WEBHOOK_LISTEN, WEBHOOK_PORT, WEBHOOK_SECRET, WEBHOOK_WORKERS, \
+    WEBHOOK_QUEUE_SIZE
+from Shared.runtime import update_chat_id
+
+# Max accepted update body size in bytes
+WEBHOOK_MAX_BODY = 1024 * 1024
+
+
+# Path of bot on webhook server
+def webhook_path(bot):
+    return f"/{bot.token}"
+
+
+# Workers - updates of one chat always go to the same worker, so they are handled in order
+class UpdateWorkers:
+    def __init__(self, workers=WEBHOOK_WORKERS, queue_size=WEBHOOK_QUEUE_SIZE):
+        self.queues = [queue.Queue(maxsize=max(1, queue_size // workers)) for _ in range(workers)]
+        self.threads = []
+        for index, updates_queue in enumerate(self.queues):
+            thread = threading.Thread(target=self.work, args=(updates_queue,), name=f"webhook_{index}", daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    # Queue update - return False if worker queue is full
+    def put(self, bot, update):
+        chat_id = update_chat_id(update)
+        index = hash((bot.token, chat_id if chat_id is not None else update.update_id)) % len(self.queues)
+        try:
+            self.queues[index].put_nowait((bot, update))
+            return True
+        except queue.Full:
+            return False
+
+    @staticmethod
+    def work(updates_queue):
+        while True:
+            bot, update = updates_queue.get()
+            try:
+                bot.process_new_updates([update])
+            except Exception as e:
+                logging.error(f"Error while handling update {update.update_id} \n Error:{e}")
+            finally:
+                updates_queue.task_done()
+
+
+# HTTP server - bots: {path: bot}
+class WebhookServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, bots, workers):
+        self.bots = bots
+        self.workers = workers
+        super().__init__(address, WebhookHandler)
+
+
+class WebhookHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        bot = self.server.bots.get(self.path.rstrip('/'))
+        if not bot:
+            return self.answer(404)
+        if WEBHOOK_SECRET and self.headers.get('X-Telegram-Bot-Api-Secret-Token') != WEBHOOK_SECRET:
+            return self.answer(403)
+        length = int(self.headers.get('Content-Length') or 0)
+        if length <= 0 or length > WEBHOOK_MAX_BODY:
+            return self.answer(400)
+        try:
+            update = telebot.types.Update.de_json(json.loads(self.rfile.read(length)))
+        except Exception as e:
+            logging.warning(f"Invalid webhook update: {e}")
+            return self.answer(400)
+        if not self.server.workers.put(bot, update):
+            logging.warning(f"Webhook queue is full, update {update.update_id} rejected")
+            return self.answer(503)
+        self.answer(200)
+
+    def answer(self, status):
+        self.send_response(status)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    # Access log is too noisy - one line per update
+    def log_message(self, format, *args):
+        pass
+
+
+# Register webhooks on Telegram - skipped if WEBHOOK_URL is not set (local testing)
+def set_webhooks(bots):
+    if not WEBHOOK_URL:
+        logging.warning("WEBHOOK_URL is not set, webhooks are not registered on Telegram")
+        return
+    for path, bot in bots.items():
+        bot.set_webhook(url=WEBHOOK_URL.rstrip('/') + path, secret_token=WEBHOOK_SECRET or None,
+                        max_connections=WEBHOOK_WORKERS)
+
+
+# Blocking entry point of webhook runtime - call setup() of each bot before
+def start(bots):
+    bots = {webhook_path(bot): bot for bot in bots}
+    for bot in bots.values():
+        # handlers run in webhook workers, not in the bot's own threads
+        bot.threaded = False
+    set_webhooks(bots)
+    server = WebhookServer((WEBHOOK_LISTEN, WEBHOOK_PORT), bots, UpdateWorkers())
+    logging.info(f"Webhook server started on {WEBHOOK_LISTEN}:{WEBHOOK_PORT} for {len(bots)} bots")
+    server.serve_forever()
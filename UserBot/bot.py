@@ -1,5 +1,7 @@
 import datetime
 import random
+import time
+from collections import OrderedDict
 
 import telebot
 from telebot.types import Message, CallbackQuery
@@ -11,19 +13,22 @@ from UserBot.content import *
 
 import Utils.utils as utils
 from Shared.common import admin_bot
+from Shared.dispatch import user_callbacks as callbacks
+from Shared.next_step import NextStepStore
 from Database.dbManager import USERS_DB
 from Utils import api
 
 # *********************************** Configuration Bot ***********************************
 bot = telebot.TeleBot(CLIENT_TOKEN, parse_mode="HTML")
-bot.remove_webhook()
 admin_bot = admin_bot()
 BASE_URL = f"{urlparse(PANEL_URL).scheme}://{urlparse(PANEL_URL).netloc}"
 selected_server_id = 0
 
 # *********************************** Helper Functions ***********************************
 # Check if message is digit
-def is_it_digit(message: Message,allow_float=False, response=MESSAGES['ERROR_INVALID_NUMBER'], markup=main_menu_keyboard_markup()):
+def is_it_digit(message: Message,allow_float=False, response=MESSAGES['ERROR_INVALID_NUMBER'], markup=None):
+    if markup is None:
+        markup = main_menu_keyboard_markup()
     if not message.text:
         bot.send_message(message.chat.id, response, reply_markup=markup)
         return False
@@ -64,12 +69,9 @@ def type_of_subscription(text):
 
 # check is user banned
 def is_user_banned(user_id):
-    user = USERS_DB.find_user(telegram_id=user_id)
-    if user:
-        user = user[0]
-        if user['banned']:
-            bot.send_message(user_id, MESSAGES['BANNED_USER'], reply_markup=main_menu_keyboard_markup())
-            return True
+    if USERS_DB.is_banned_user(user_id):
+        bot.send_message(user_id, MESSAGES['BANNED_USER'], reply_markup=main_menu_keyboard_markup())
+        return True
     return False
 # *********************************** Next-Step Handlers ***********************************
 # ----------------------------------- Buy Plan Area -----------------------------------
@@ -77,12 +79,23 @@ charge_wallet = {}
 renew_subscription_dict = {}
 
 
-def user_channel_status(user_id):
+# Channel membership cache - bounded LRU {user_id: (channel_id, is_member, expire_time)}
+channel_status_cache = OrderedDict()
+
+
+def user_channel_status(user_id, recheck=False):
     try:
         settings = utils.all_configs_settings()
         if settings['channel_id']:
+            cached = utils.lru_get(channel_status_cache, user_id)
+            if not recheck and cached and cached[0] == settings['channel_id'] and cached[2] > time.monotonic():
+                return cached[1]
             user = bot.get_chat_member(settings['channel_id'], user_id)
-            return user.status in ['member', 'administrator', 'creator']
+            is_member = user.status in ['member', 'administrator', 'creator']
+            ttl = CHANNEL_MEMBER_TTL if is_member else CHANNEL_NOT_MEMBER_TTL
+            utils.lru_set(channel_status_cache, user_id, (settings['channel_id'], is_member, time.monotonic() + ttl),
+                          CHANNEL_STATUS_CACHE_SIZE)
+            return is_member
         else:
             return True
     except telebot.apihelper.ApiException as e:
@@ -90,12 +103,12 @@ def user_channel_status(user_id):
         return False
 
 
-def is_user_in_channel(user_id):
+def is_user_in_channel(user_id, recheck=False):
     settings = all_configs_settings()
     if settings['force_join_channel'] == 1:
         if not settings['channel_id']:
             return True
-        if not user_channel_status(user_id):
+        if not user_channel_status(user_id, recheck):
             bot.send_message(user_id, MESSAGES['REQUEST_JOIN_CHANNEL'],
                              reply_markup=force_join_channel_markup(settings['channel_id']))
             return False
@@ -193,8 +206,7 @@ def renewal_from_wallet_confirm(message: Message):
                          reply_markup=main_menu_keyboard_markup())
         return
     user_info_process = user_info_process[0]
-    new_balance = int(wallet['balance']) - int(plan_info['price'])
-    edit_wallet = USERS_DB.edit_wallet(message.chat.id, balance=new_balance)
+    edit_wallet = USERS_DB.change_wallet_balance(message.chat.id, -int(plan_info['price']))
     if not edit_wallet:
         bot.send_message(message.chat.id, MESSAGES['UNKNOWN_ERROR'],
                          reply_markup=main_menu_keyboard_markup())
@@ -408,8 +420,7 @@ def next_step_send_name_for_buy_from_wallet(message: Message, plan):
     wallet = USERS_DB.find_wallet(telegram_id=message.chat.id)
     if wallet:
         wallet = wallet[0]
-        wallet_balance = int(wallet['balance']) - int(paid_amount)
-        user_info = USERS_DB.edit_wallet(message.chat.id, balance=wallet_balance)
+        user_info = USERS_DB.change_wallet_balance(message.chat.id, -int(paid_amount))
         if not user_info:
             bot.send_message(message.chat.id,
                              f"{MESSAGES['UNKNOWN_ERROR']}:Edit Wallet Balance Error\n{MESSAGES['ORDER_ID']} {order_id}",
@@ -543,11 +554,13 @@ def next_step_link_subscription(message: Message):
         if not servers:
             bot.send_message(message.chat.id, MESSAGES['UNKNOWN_ERROR'], reply_markup=main_menu_keyboard_markup())
             return
-        for server in servers:
-            users_list = api.find(server['url'] + API_PATH, uuid)
-            if users_list:
-                server_id = server['id']
-                break
+        results, timed_out = utils.servers_fan_out(
+            servers, lambda server: api.find(server['url'] + API_PATH, uuid), first_match=True)
+        if not results:
+            bot.send_message(message.chat.id, MESSAGES['SUBSCRIPTION_INFO_NOT_FOUND'],
+                             reply_markup=main_menu_keyboard_markup())
+            return
+        server_id = results[0][0]['id']
         status = USERS_DB.add_non_order_subscription(non_sub_id, message.chat.id, uuid, server_id)
         if status:
             bot.send_message(message.chat.id, MESSAGES['SUBSCRIPTION_CONFIRMED'],
@@ -655,474 +668,553 @@ def update_info_subscription(message: Message, uuid,markup=None):
 
 
 # *********************************** Callback Query Area ***********************************
-@bot.callback_query_handler(func=lambda call: True)
-def callback_query(call: CallbackQuery):
-    bot.answer_callback_query(call.id, MESSAGES['WAIT'])
-    bot.clear_step_handler(call.message)
-    if is_user_banned(call.message.chat.id):
+# ----------------------------------- Link Subscription Area -----------------------------------
+# Confirm Link Subscription
+@callbacks.register("force_join_status")
+def callback_force_join_status(call: CallbackQuery, value):
+    bot.delete_message(call.message.chat.id, call.message.message_id)
+    # user says joined - do not trust cached result
+    join_status = is_user_in_channel(call.message.chat.id, recheck=True)
+
+    if not join_status:
         return
-    # Split Callback Data to Key(Command) and UUID
-    data = call.data.split(':')
-    key = data[0]
-    value = data[1]
+    else:
+        bot.send_message(call.message.chat.id, MESSAGES['JOIN_CHANNEL_SUCCESSFUL'])
 
-    global selected_server_id
-    # ----------------------------------- Link Subscription Area -----------------------------------
-    # Confirm Link Subscription
-    if key == 'force_join_status':
-        bot.delete_message(call.message.chat.id, call.message.message_id)
-        join_status = is_user_in_channel(call.message.chat.id)
 
-        if not join_status:
-            return
-        else:
-            bot.send_message(call.message.chat.id, MESSAGES['JOIN_CHANNEL_SUCCESSFUL'])
-            
-    elif key == 'confirm_subscription':
-        edit_status = USERS_DB.add_non_order_subscription(call.message.chat.id, value, )
-        if edit_status:
-            bot.delete_message(call.message.chat.id, call.message.message_id)
-            bot.send_message(call.message.chat.id, MESSAGES['SUBSCRIPTION_CONFIRMED'],
-                             reply_markup=main_menu_keyboard_markup())
-        else:
-            bot.send_message(call.message.chat.id, MESSAGES['UNKNOWN_ERROR'],
-                             reply_markup=main_menu_keyboard_markup())
-    # Reject Link Subscription
-    elif key == 'cancel_subscription':
+@callbacks.register("confirm_subscription")
+def callback_confirm_subscription(call: CallbackQuery, value):
+    edit_status = USERS_DB.add_non_order_subscription(call.message.chat.id, value, )
+    if edit_status:
         bot.delete_message(call.message.chat.id, call.message.message_id)
-        bot.send_message(call.message.chat.id, MESSAGES['CANCEL_SUBSCRIPTION'],
+        bot.send_message(call.message.chat.id, MESSAGES['SUBSCRIPTION_CONFIRMED'],
+                         reply_markup=main_menu_keyboard_markup())
+    else:
+        bot.send_message(call.message.chat.id, MESSAGES['UNKNOWN_ERROR'],
                          reply_markup=main_menu_keyboard_markup())
 
-    # ----------------------------------- Buy Plan Area -----------------------------------
-    elif key == 'server_selected':
-        if value == 'False':
-            bot.send_message(call.message.chat.id, MESSAGES['SERVER_IS_FULL'], reply_markup=main_menu_keyboard_markup())
-            return
-        selected_server_id = int(value)
-        plans = USERS_DB.find_plan(server_id=int(value))
-        if not plans:
-            bot.send_message(call.message.chat.id, MESSAGES['PLANS_NOT_FOUND'], reply_markup=main_menu_keyboard_markup())
-            return
-        plan_markup = plans_list_markup(plans)
-        if not plan_markup:
-            bot.send_message(call.message.chat.id, MESSAGES['PLANS_NOT_FOUND'], reply_markup=main_menu_keyboard_markup())
-            return
-        bot.edit_message_text(MESSAGES['PLANS_LIST'], call.message.chat.id, call.message.message_id,
-                                    reply_markup=plan_markup)
-        
-    elif key == 'free_test_server_selected':
-        if value == 'False':
-            bot.send_message(call.message.chat.id, MESSAGES['SERVER_IS_FULL'], reply_markup=main_menu_keyboard_markup())
-            return
-        users = USERS_DB.find_user(telegram_id=call.message.chat.id)
-        if users:
-            user = users[0]
-            if user['test_subscription']:
-                bot.send_message(call.message.chat.id, MESSAGES['ALREADY_RECEIVED_FREE'],
-                                reply_markup=main_menu_keyboard_markup())
-                return
-            bot.delete_message(call.message.chat.id, call.message.message_id)
-            bot.send_message(call.message.chat.id, MESSAGES['REQUEST_SEND_NAME'], reply_markup=cancel_markup())
-            bot.register_next_step_handler(call.message, next_step_send_name_for_get_free_test, value)
-    # Send Asked Plan Info
-    elif key == 'plan_selected':
-        plan = USERS_DB.find_plan(id=value)[0]
-        if not plan:
-            bot.send_message(call.message.chat.id, MESSAGES['UNKNOWN_ERROR'],
-                             reply_markup=main_menu_keyboard_markup())
+
+# Reject Link Subscription
+@callbacks.register("cancel_subscription")
+def callback_cancel_subscription(call: CallbackQuery, value):
+    bot.delete_message(call.message.chat.id, call.message.message_id)
+    bot.send_message(call.message.chat.id, MESSAGES['CANCEL_SUBSCRIPTION'],
+                     reply_markup=main_menu_keyboard_markup())
+
+
+# ----------------------------------- Buy Plan Area -----------------------------------
+@callbacks.register("server_selected")
+def callback_server_selected(call: CallbackQuery, value):
+    global selected_server_id
+    if value == 'False':
+        bot.send_message(call.message.chat.id, MESSAGES['SERVER_IS_FULL'], reply_markup=main_menu_keyboard_markup())
+        return
+    selected_server_id = int(value)
+    plans = USERS_DB.find_plan(server_id=int(value))
+    if not plans:
+        bot.send_message(call.message.chat.id, MESSAGES['PLANS_NOT_FOUND'], reply_markup=main_menu_keyboard_markup())
+        return
+    plan_markup = plans_list_markup(plans)
+    if not plan_markup:
+        bot.send_message(call.message.chat.id, MESSAGES['PLANS_NOT_FOUND'], reply_markup=main_menu_keyboard_markup())
+        return
+    bot.edit_message_text(MESSAGES['PLANS_LIST'], call.message.chat.id, call.message.message_id,
+                                reply_markup=plan_markup)
+
+
+@callbacks.register("free_test_server_selected")
+def callback_free_test_server_selected(call: CallbackQuery, value):
+    if value == 'False':
+        bot.send_message(call.message.chat.id, MESSAGES['SERVER_IS_FULL'], reply_markup=main_menu_keyboard_markup())
+        return
+    users = USERS_DB.find_user(telegram_id=call.message.chat.id)
+    if users:
+        user = users[0]
+        if user['test_subscription']:
+            bot.send_message(call.message.chat.id, MESSAGES['ALREADY_RECEIVED_FREE'],
+                            reply_markup=main_menu_keyboard_markup())
             return
-        bot.edit_message_text(chat_id=call.message.chat.id, message_id=call.message.message_id,
-                              text=plan_info_template(plan),
-                              reply_markup=confirm_buy_plan_markup(plan['id']))
-
-    # Confirm To Buy From Wallet
-    elif key == 'confirm_buy_from_wallet':
-        plan = USERS_DB.find_plan(id=value)[0]
-        buy_from_wallet_confirm(call.message, plan)
-    elif key == 'confirm_renewal_from_wallet':
-        plan = USERS_DB.find_plan(id=value)[0]
-        renewal_from_wallet_confirm(call.message)
-
-    # Ask To Send Screenshot
-    elif key == 'send_screenshot':
         bot.delete_message(call.message.chat.id, call.message.message_id)
-        bot.send_message(call.message.chat.id, MESSAGES['REQUEST_SEND_SCREENSHOT'])
-        bot.register_next_step_handler(call.message, next_step_send_screenshot, charge_wallet)
-
-    #Answer to Admin After send Screenshot
-    elif key == 'answer_to_admin':
-        #bot.delete_message(call.message.chat.id,call.message.message_id)
-        bot.send_message(call.message.chat.id, MESSAGES['ANSWER_TO_ADMIN'],
-                        reply_markup=cancel_markup())
-        bot.register_next_step_handler(call.message, next_step_answer_to_admin, value)
-
-    #Send Ticket to Admin 
-    elif key == 'send_ticket_to_support':
-        bot.delete_message(call.message.chat.id,call.message.message_id)
-        bot.send_message(call.message.chat.id, MESSAGES['SEND_TICKET_TO_ADMIN'],
-                        reply_markup=cancel_markup())
-        bot.register_next_step_handler(call.message, next_step_send_ticket_to_admin)
-
-    # ----------------------------------- User Subscriptions Info Area -----------------------------------
-    # Unlink non-order subscription
-    elif key == 'unlink_subscription':
-        delete_status = USERS_DB.delete_non_order_subscription(uuid=value)
-        if delete_status:
-            bot.delete_message(call.message.chat.id, call.message.message_id)
-            bot.send_message(call.message.chat.id, MESSAGES['SUBSCRIPTION_UNLINKED'],
-                             reply_markup=main_menu_keyboard_markup())
-        else:
-            bot.send_message(call.message.chat.id, MESSAGES['UNKNOWN_ERROR'],
-                             reply_markup=main_menu_keyboard_markup())
+        bot.send_message(call.message.chat.id, MESSAGES['REQUEST_SEND_NAME'], reply_markup=cancel_markup())
+        bot.register_next_step_handler(call.message, next_step_send_name_for_get_free_test, value)
+
+
+# Send Asked Plan Info
+@callbacks.register("plan_selected")
+def callback_plan_selected(call: CallbackQuery, value):
+    plan = USERS_DB.find_plan(id=value)[0]
+    if not plan:
+        bot.send_message(call.message.chat.id, MESSAGES['UNKNOWN_ERROR'],
+                         reply_markup=main_menu_keyboard_markup())
+        return
+    bot.edit_message_text(chat_id=call.message.chat.id, message_id=call.message.message_id,
+                          text=plan_info_template(plan),
+                          reply_markup=confirm_buy_plan_markup(plan['id']))
+
+
+# Confirm To Buy From Wallet
+@callbacks.register("confirm_buy_from_wallet")
+def callback_confirm_buy_from_wallet(call: CallbackQuery, value):
+    plan = USERS_DB.find_plan(id=value)[0]
+    buy_from_wallet_confirm(call.message, plan)
+
+
+@callbacks.register("confirm_renewal_from_wallet")
+def callback_confirm_renewal_from_wallet(call: CallbackQuery, value):
+    plan = USERS_DB.find_plan(id=value)[0]
+    renewal_from_wallet_confirm(call.message)
+
+
+# Ask To Send Screenshot
+@callbacks.register("send_screenshot")
+def callback_send_screenshot(call: CallbackQuery, value):
+    bot.delete_message(call.message.chat.id, call.message.message_id)
+    bot.send_message(call.message.chat.id, MESSAGES['REQUEST_SEND_SCREENSHOT'])
+    bot.register_next_step_handler(call.message, next_step_send_screenshot, charge_wallet)
 
-    elif key == 'update_info_subscription':
-        update_info_subscription(call.message, value)
 
-    # ----------------------------------- wallet Area -----------------------------------
-    # INCREASE WALLET BALANCE
-    elif key == 'increase_wallet_balance':
-        bot.send_message(call.message.chat.id, MESSAGES['INCREASE_WALLET_BALANCE_AMOUNT'], reply_markup=cancel_markup())
+#Answer to Admin After send Screenshot
+@callbacks.register("answer_to_admin")
+def callback_answer_to_admin(call: CallbackQuery, value):
+    #bot.delete_message(call.message.chat.id,call.message.message_id)
+    bot.send_message(call.message.chat.id, MESSAGES['ANSWER_TO_ADMIN'],
+                    reply_markup=cancel_markup())
+    bot.register_next_step_handler(call.message, next_step_answer_to_admin, value)
 
-        bot.register_next_step_handler(call.message, next_step_increase_wallet_balance)
-    elif key == 'increase_wallet_balance_specific':
+
+#Send Ticket to Admin
+@callbacks.register("send_ticket_to_support")
+def callback_send_ticket_to_support(call: CallbackQuery, value):
+    bot.delete_message(call.message.chat.id,call.message.message_id)
+    bot.send_message(call.message.chat.id, MESSAGES['SEND_TICKET_TO_ADMIN'],
+                    reply_markup=cancel_markup())
+    bot.register_next_step_handler(call.message, next_step_send_ticket_to_admin)
+
+
+# ----------------------------------- User Subscriptions Info Area -----------------------------------
+# Unlink non-order subscription
+@callbacks.register("unlink_subscription")
+def callback_unlink_subscription(call: CallbackQuery, value):
+    delete_status = USERS_DB.delete_non_order_subscription(uuid=value)
+    if delete_status:
         bot.delete_message(call.message.chat.id, call.message.message_id)
-        increase_wallet_balance_specific(call.message,value)
-    elif key == 'renewal_subscription':
-        settings = utils.all_configs_settings()
-        if not settings['renewal_subscription_status']:
-            bot.send_message(call.message.chat.id, MESSAGES['RENEWAL_SUBSCRIPTION_CLOSED'],
-                             reply_markup=main_menu_keyboard_markup())
-            return
-        servers = USERS_DB.select_servers()
-        server_id = 0
-        user= []
-        URL = "url"
-        if servers:
-            for server in servers:
-                user = api.find(server['url'] + API_PATH, value)
-                if user:
-                    selected_server_id = server['id']
-                    URL = server['url'] + API_PATH
-                    break
-        if not user:
-            bot.send_message(call.message.chat.id, MESSAGES['UNKNOWN_ERROR'],
-                             reply_markup=main_menu_keyboard_markup())
-            return
-        user_info = utils.users_to_dict([user])
-        if not user_info:
-            bot.send_message(call.message.chat.id, MESSAGES['UNKNOWN_ERROR'],
+        bot.send_message(call.message.chat.id, MESSAGES['SUBSCRIPTION_UNLINKED'],
+                         reply_markup=main_menu_keyboard_markup())
+    else:
+        bot.send_message(call.message.chat.id, MESSAGES['UNKNOWN_ERROR'],
+                         reply_markup=main_menu_keyboard_markup())
+
+
+@callbacks.register("update_info_subscription")
+def callback_update_info_subscription(call: CallbackQuery, value):
+    update_info_subscription(call.message, value)
+
+
+# ----------------------------------- wallet Area -----------------------------------
+# INCREASE WALLET BALANCE
+@callbacks.register("increase_wallet_balance")
+def callback_increase_wallet_balance(call: CallbackQuery, value):
+    bot.send_message(call.message.chat.id, MESSAGES['INCREASE_WALLET_BALANCE_AMOUNT'], reply_markup=cancel_markup())
+
+    bot.register_next_step_handler(call.message, next_step_increase_wallet_balance)
+
+
+@callbacks.register("increase_wallet_balance_specific")
+def callback_increase_wallet_balance_specific(call: CallbackQuery, value):
+    bot.delete_message(call.message.chat.id, call.message.message_id)
+    increase_wallet_balance_specific(call.message,value)
+
+
+@callbacks.register("renewal_subscription")
+def callback_renewal_subscription(call: CallbackQuery, value):
+    global selected_server_id
+    settings = utils.all_configs_settings()
+    if not settings['renewal_subscription_status']:
+        bot.send_message(call.message.chat.id, MESSAGES['RENEWAL_SUBSCRIPTION_CLOSED'],
+                         reply_markup=main_menu_keyboard_markup())
+        return
+    servers = USERS_DB.select_servers()
+    server_id = 0
+    user= []
+    URL = "url"
+    if servers:
+        for server in servers:
+            user = api.find(server['url'] + API_PATH, value)
+            if user:
+                selected_server_id = server['id']
+                URL = server['url'] + API_PATH
+                break
+    if not user:
+        bot.send_message(call.message.chat.id, MESSAGES['UNKNOWN_ERROR'],
+                         reply_markup=main_menu_keyboard_markup())
+        return
+    user_info = utils.users_to_dict([user])
+    if not user_info:
+        bot.send_message(call.message.chat.id, MESSAGES['UNKNOWN_ERROR'],
+                         reply_markup=main_menu_keyboard_markup())
+        return
+
+    user_info_process = utils.dict_process(URL, user_info)
+    if not user_info_process:
+        bot.send_message(call.message.chat.id, MESSAGES['UNKNOWN_ERROR'],
+                         reply_markup=main_menu_keyboard_markup())
+        return
+    user_info_process = user_info_process[0]
+    if settings['renewal_method'] == 2:
+        if user_info_process['remaining_day'] > settings['advanced_renewal_days'] and user_info_process['usage']['remaining_usage_GB'] > settings['advanced_renewal_usage']:
+            bot.send_message(call.message.chat.id, renewal_unvalable_template(settings),
                              reply_markup=main_menu_keyboard_markup())
             return
 
-        user_info_process = utils.dict_process(URL, user_info)
-        if not user_info_process:
-            bot.send_message(call.message.chat.id, MESSAGES['UNKNOWN_ERROR'],
+
+    renew_subscription_dict[call.message.chat.id] = {
+        'uuid': None,
+        'plan_id': None,
+    }
+    plans = USERS_DB.find_plan(server_id=selected_server_id)
+    if not plans:
+        bot.send_message(call.message.chat.id, MESSAGES['PLANS_NOT_FOUND'],
+                         reply_markup=main_menu_keyboard_markup())
+        return
+    renew_subscription_dict[call.message.chat.id]['uuid'] = value
+    bot.edit_message_reply_markup(call.message.chat.id, call.message.message_id,
+                                  reply_markup=plans_list_markup(plans, renewal=True,uuid=user_info_process['uuid']))
+
+
+@callbacks.register("renewal_plan_selected")
+def callback_renewal_plan_selected(call: CallbackQuery, value):
+    plan = USERS_DB.find_plan(id=value)[0]
+    if not plan:
+        bot.send_message(call.message.chat.id, MESSAGES['PLANS_NOT_FOUND'],
+                         reply_markup=main_menu_keyboard_markup())
+        return
+    renew_subscription_dict[call.message.chat.id]['plan_id'] = plan['id']
+    bot.edit_message_text(chat_id=call.message.chat.id, message_id=call.message.message_id,
+                          text=plan_info_template(plan),
+                          reply_markup=confirm_buy_plan_markup(plan['id'], renewal=True,uuid=renew_subscription_dict[call.message.chat.id]['uuid']))
+
+
+@callbacks.register("cancel_increase_wallet_balance")
+def callback_cancel_increase_wallet_balance(call: CallbackQuery, value):
+    bot.delete_message(call.message.chat.id, call.message.message_id)
+    bot.send_message(call.message.chat.id, MESSAGES['CANCEL_INCREASE_WALLET_BALANCE'],
+                     reply_markup=main_menu_keyboard_markup())
+
+
+# ----------------------------------- User Configs Area -----------------------------------
+# User Configs - Main Menu
+@callbacks.register("configs_list")
+def callback_configs_list(call: CallbackQuery, value):
+    bot.edit_message_reply_markup(call.message.chat.id, call.message.message_id,
+                                  reply_markup=sub_url_user_list_markup(value))
+
+
+# User Configs - Direct Link
+@callbacks.register("conf_dir")
+def callback_conf_dir(call: CallbackQuery, value):
+    sub = utils.sub_links(value)
+    if not sub:
+        bot.send_message(call.message.chat.id, MESSAGES['UNKNOWN_ERROR'])
+        return
+    configs = utils.sub_parse(sub['sub_link'])
+    if not configs:
+        bot.send_message(call.message.chat.id, MESSAGES['ERROR_CONFIG_NOT_FOUND'])
+        return
+    bot.edit_message_reply_markup(call.message.chat.id, call.message.message_id,
+                                  reply_markup=sub_user_list_markup(value,configs))
+
+
+# User Configs - Vless Configs Callback
+@callbacks.register("conf_dir_vless")
+def callback_conf_dir_vless(call: CallbackQuery, value):
+    sub = utils.sub_links(value)
+    if not sub:
+        bot.send_message(call.message.chat.id, MESSAGES['UNKNOWN_ERROR'])
+        return
+    configs = utils.sub_parse(sub['sub_link'])
+    if not configs:
+        bot.send_message(call.message.chat.id, MESSAGES['ERROR_CONFIG_NOT_FOUND'])
+        return
+    if not configs['vless']:
+        bot.send_message(call.message.chat.id, MESSAGES['ERROR_CONFIG_NOT_FOUND'])
+        return
+    msgs = configs_template(configs['vless'])
+    for message in msgs:
+        if message:
+            bot.send_message(call.message.chat.id, f"{message}",
                              reply_markup=main_menu_keyboard_markup())
-            return
-        user_info_process = user_info_process[0]
-        if settings['renewal_method'] == 2:
-            if user_info_process['remaining_day'] > settings['advanced_renewal_days'] and user_info_process['usage']['remaining_usage_GB'] > settings['advanced_renewal_usage']:
-                bot.send_message(call.message.chat.id, renewal_unvalable_template(settings),
-                                 reply_markup=main_menu_keyboard_markup())
-                return
-        
 
-        renew_subscription_dict[call.message.chat.id] = {
-            'uuid': None,
-            'plan_id': None,
-        }
-        plans = USERS_DB.find_plan(server_id=selected_server_id)
-        if not plans:
-            bot.send_message(call.message.chat.id, MESSAGES['PLANS_NOT_FOUND'],
+
+# User Configs - VMess Configs Callback
+@callbacks.register("conf_dir_vmess")
+def callback_conf_dir_vmess(call: CallbackQuery, value):
+    sub = utils.sub_links(value)
+    if not sub:
+        bot.send_message(call.message.chat.id, MESSAGES['UNKNOWN_ERROR'])
+        return
+    configs = utils.sub_parse(sub['sub_link'])
+    if not configs:
+        bot.send_message(call.message.chat.id, MESSAGES['ERROR_CONFIG_NOT_FOUND'])
+        return
+    if not configs['vmess']:
+        bot.send_message(call.message.chat.id, MESSAGES['ERROR_CONFIG_NOT_FOUND'])
+        return
+    msgs = configs_template(configs['vmess'])
+    for message in msgs:
+        if message:
+            bot.send_message(call.message.chat.id, f"{message}",
                              reply_markup=main_menu_keyboard_markup())
-            return
-        renew_subscription_dict[call.message.chat.id]['uuid'] = value
-        bot.edit_message_reply_markup(call.message.chat.id, call.message.message_id,
-                                      reply_markup=plans_list_markup(plans, renewal=True,uuid=user_info_process['uuid']))
-
-    elif key == 'renewal_plan_selected':
-        plan = USERS_DB.find_plan(id=value)[0]
-        if not plan:
-            bot.send_message(call.message.chat.id, MESSAGES['PLANS_NOT_FOUND'],
+
+
+# User Configs - Trojan Configs Callback
+@callbacks.register("conf_dir_trojan")
+def callback_conf_dir_trojan(call: CallbackQuery, value):
+    sub = utils.sub_links(value)
+    if not sub:
+        bot.send_message(call.message.chat.id, MESSAGES['UNKNOWN_ERROR'])
+        return
+    configs = utils.sub_parse(sub['sub_link'])
+    if not configs:
+        bot.send_message(call.message.chat.id, MESSAGES['ERROR_CONFIG_NOT_FOUND'])
+        return
+    if not configs['trojan']:
+        bot.send_message(call.message.chat.id, MESSAGES['ERROR_CONFIG_NOT_FOUND'])
+        return
+    msgs = configs_template(configs['trojan'])
+    for message in msgs:
+        if message:
+            bot.send_message(call.message.chat.id, f"{message}",
                              reply_markup=main_menu_keyboard_markup())
-            return
-        renew_subscription_dict[call.message.chat.id]['plan_id'] = plan['id']
-        bot.edit_message_text(chat_id=call.message.chat.id, message_id=call.message.message_id,
-                              text=plan_info_template(plan),
-                              reply_markup=confirm_buy_plan_markup(plan['id'], renewal=True,uuid=renew_subscription_dict[call.message.chat.id]['uuid']))
 
-    elif key == 'cancel_increase_wallet_balance':
-        bot.delete_message(call.message.chat.id, call.message.message_id)
-        bot.send_message(call.message.chat.id, MESSAGES['CANCEL_INCREASE_WALLET_BALANCE'],
+
+# User Configs - Subscription Configs Callback
+@callbacks.register("conf_sub_url")
+def callback_conf_sub_url(call: CallbackQuery, value):
+    sub = utils.sub_links(value)
+    if not sub:
+        bot.send_message(call.message.chat.id, MESSAGES['UNKNOWN_ERROR'])
+        return
+    qr_msg = utils.send_qr_photo(
+        bot,
+        call.message.chat.id,
+        sub['sub_link'],
+        caption=f"{KEY_MARKUP['CONFIGS_SUB']}\n<code>{sub['sub_link']}</code>",
+        reply_markup=main_menu_keyboard_markup()
+    )
+    if not qr_msg:
+        bot.send_message(call.message.chat.id, MESSAGES['UNKNOWN_ERROR'])
+        return
+
+
+# User Configs - Base64 Subscription Configs Callback
+@callbacks.register("conf_sub_url_b64")
+def callback_conf_sub_url_b64(call: CallbackQuery, value):
+    sub = utils.sub_links(value)
+    if not sub:
+        bot.send_message(call.message.chat.id, MESSAGES['UNKNOWN_ERROR'])
+        return
+    qr_msg = utils.send_qr_photo(
+        bot,
+        call.message.chat.id,
+        sub['sub_link_b64'],
+        caption=f"{KEY_MARKUP['CONFIGS_SUB_B64']}\n<code>{sub['sub_link_b64']}</code>",
+        reply_markup=main_menu_keyboard_markup()
+    )
+    if not qr_msg:
+        bot.send_message(call.message.chat.id, MESSAGES['UNKNOWN_ERROR'])
+        return
+
+
+# User Configs - Subscription Configs For Clash Callback
+@callbacks.register("conf_clash")
+def callback_conf_clash(call: CallbackQuery, value):
+    sub = utils.sub_links(value)
+    if not sub:
+        bot.send_message(call.message.chat.id, MESSAGES['UNKNOWN_ERROR'])
+        return
+    qr_msg = utils.send_qr_photo(
+        bot,
+        call.message.chat.id,
+        sub['clash_configs'],
+        caption=f"{KEY_MARKUP['CONFIGS_CLASH']}\n<code>{sub['clash_configs']}</code>",
+        reply_markup=main_menu_keyboard_markup()
+    )
+    if not qr_msg:
+        bot.send_message(call.message.chat.id, MESSAGES['UNKNOWN_ERROR'])
+        return
+
+
+# User Configs - Subscription Configs For Hiddify Callback
+@callbacks.register("conf_hiddify")
+def callback_conf_hiddify(call: CallbackQuery, value):
+    sub = utils.sub_links(value)
+    if not sub:
+        bot.send_message(call.message.chat.id, MESSAGES['UNKNOWN_ERROR'])
+        return
+    qr_msg = utils.send_qr_photo(
+        bot,
+        call.message.chat.id,
+        sub['hiddify_configs'],
+        caption=f"{KEY_MARKUP['CONFIGS_HIDDIFY']}\n<code>{sub['hiddify_configs']}</code>",
+        reply_markup=main_menu_keyboard_markup()
+    )
+    if not qr_msg:
+        bot.send_message(call.message.chat.id, MESSAGES['UNKNOWN_ERROR'])
+        return
+
+
+@callbacks.register("conf_sub_auto")
+def callback_conf_sub_auto(call: CallbackQuery, value):
+    sub = utils.sub_links(value)
+    if not sub:
+        bot.send_message(call.message.chat.id, MESSAGES['UNKNOWN_ERROR'])
+        return
+    qr_msg = utils.send_qr_photo(
+        bot,
+        call.message.chat.id,
+        sub['sub_link_auto'],
+        caption=f"{KEY_MARKUP['CONFIGS_SUB_AUTO']}\n<code>{sub['sub_link_auto']}</code>",
+        reply_markup=main_menu_keyboard_markup()
+    )
+    if not qr_msg:
+        bot.send_message(call.message.chat.id, MESSAGES['UNKNOWN_ERROR'])
+        return
+
+
+@callbacks.register("conf_sub_sing_box")
+def callback_conf_sub_sing_box(call: CallbackQuery, value):
+    sub = utils.sub_links(value)
+    if not sub:
+        bot.send_message(call.message.chat.id, MESSAGES['UNKNOWN_ERROR'])
+        return
+    qr_msg = utils.send_qr_photo(
+        bot,
+        call.message.chat.id,
+        sub['sing_box'],
+        caption=f"{KEY_MARKUP['CONFIGS_SING_BOX']}\n<code>{sub['sing_box']}</code>",
+        reply_markup=main_menu_keyboard_markup()
+    )
+    if not qr_msg:
+        bot.send_message(call.message.chat.id, MESSAGES['UNKNOWN_ERROR'])
+        return
+
+
+@callbacks.register("conf_sub_full_sing_box")
+def callback_conf_sub_full_sing_box(call: CallbackQuery, value):
+    sub = utils.sub_links(value)
+    if not sub:
+        bot.send_message(call.message.chat.id, MESSAGES['UNKNOWN_ERROR'])
+        return
+    qr_msg = utils.send_qr_photo(
+        bot,
+        call.message.chat.id,
+        sub['sing_box_full'],
+        caption=f"{KEY_MARKUP['CONFIGS_FULL_SING_BOX']}\n<code>{sub['sing_box_full']}</code>",
+        reply_markup=main_menu_keyboard_markup()
+    )
+    if not qr_msg:
+        bot.send_message(call.message.chat.id, MESSAGES['UNKNOWN_ERROR'])
+        return
+
+
+# manual
+@callbacks.register("msg_manual")
+def callback_msg_manual(call: CallbackQuery, value):
+    settings = utils.all_configs_settings()
+    android_msg = settings['msg_manual_android'] if settings['msg_manual_android'] else MESSAGES['MANUAL_ANDROID']
+    ios_msg = settings['msg_manual_ios'] if settings['msg_manual_ios'] else MESSAGES['MANUAL_IOS']
+    win_msg = settings['msg_manual_windows'] if settings['msg_manual_windows'] else MESSAGES['MANUAL_WIN']
+    mac_msg = settings['msg_manual_mac'] if settings['msg_manual_mac'] else MESSAGES['MANUAL_MAC']
+    linux_msg = settings['msg_manual_linux'] if settings['msg_manual_linux'] else MESSAGES['MANUAL_LIN']
+    if value == 'android':
+        bot.send_message(call.message.chat.id, android_msg, reply_markup=main_menu_keyboard_markup())
+    elif value == 'ios':
+        bot.send_message(call.message.chat.id, ios_msg, reply_markup=main_menu_keyboard_markup())
+    elif value == 'win':
+        bot.send_message(call.message.chat.id, win_msg, reply_markup=main_menu_keyboard_markup())
+    elif value == 'mac':
+        bot.send_message(call.message.chat.id, mac_msg, reply_markup=main_menu_keyboard_markup())
+    elif value == 'lin':
+        bot.send_message(call.message.chat.id, linux_msg, reply_markup=main_menu_keyboard_markup())
+
+
+# ----------------------------------- Back Area -----------------------------------
+# Back To User Menu
+@callbacks.register("back_to_user_panel")
+def callback_back_to_user_panel(call: CallbackQuery, value):
+    bot.edit_message_reply_markup(call.message.chat.id, call.message.message_id,
+                                  reply_markup=user_info_markup(value))
+
+
+# Back To Plans
+@callbacks.register("back_to_plans")
+def callback_back_to_plans(call: CallbackQuery, value):
+    plans = USERS_DB.find_plan(server_id=selected_server_id)
+    if not plans:
+        bot.send_message(call.message.chat.id, MESSAGES['UNKNOWN_ERROR'],
                          reply_markup=main_menu_keyboard_markup())
-    # ----------------------------------- User Configs Area -----------------------------------
-    # User Configs - Main Menu
-    elif key == 'configs_list':
-        bot.edit_message_reply_markup(call.message.chat.id, call.message.message_id,
-                                      reply_markup=sub_url_user_list_markup(value))
-    # User Configs - Direct Link
-    elif key == 'conf_dir':
-        sub = utils.sub_links(value)
-        if not sub:
-            bot.send_message(call.message.chat.id, MESSAGES['UNKNOWN_ERROR'])
-            return
-        configs = utils.sub_parse(sub['sub_link'])
-        if not configs:
-            bot.send_message(call.message.chat.id, MESSAGES['ERROR_CONFIG_NOT_FOUND'])
-            return
-        bot.edit_message_reply_markup(call.message.chat.id, call.message.message_id,
-                                      reply_markup=sub_user_list_markup(value,configs))
-        
-    # User Configs - Vless Configs Callback
-    elif key == "conf_dir_vless":
-        sub = utils.sub_links(value)
-        if not sub:
-            bot.send_message(call.message.chat.id, MESSAGES['UNKNOWN_ERROR'])
-            return
-        configs = utils.sub_parse(sub['sub_link'])
-        if not configs:
-            bot.send_message(call.message.chat.id, MESSAGES['ERROR_CONFIG_NOT_FOUND'])
-            return
-        if not configs['vless']:
-            bot.send_message(call.message.chat.id, MESSAGES['ERROR_CONFIG_NOT_FOUND'])
-            return
-        msgs = configs_template(configs['vless'])
-        for message in msgs:
-            if message:
-                bot.send_message(call.message.chat.id, f"{message}",
-                                 reply_markup=main_menu_keyboard_markup())
-    # User Configs - VMess Configs Callback
-    elif key == "conf_dir_vmess":
-        sub = utils.sub_links(value)
-        if not sub:
-            bot.send_message(call.message.chat.id, MESSAGES['UNKNOWN_ERROR'])
-            return
-        configs = utils.sub_parse(sub['sub_link'])
-        if not configs:
-            bot.send_message(call.message.chat.id, MESSAGES['ERROR_CONFIG_NOT_FOUND'])
-            return
-        if not configs['vmess']:
-            bot.send_message(call.message.chat.id, MESSAGES['ERROR_CONFIG_NOT_FOUND'])
-            return
-        msgs = configs_template(configs['vmess'])
-        for message in msgs:
-            if message:
-                bot.send_message(call.message.chat.id, f"{message}",
-                                 reply_markup=main_menu_keyboard_markup())
-    # User Configs - Trojan Configs Callback
-    elif key == "conf_dir_trojan":
-        sub = utils.sub_links(value)
-        if not sub:
-            bot.send_message(call.message.chat.id, MESSAGES['UNKNOWN_ERROR'])
-            return
-        configs = utils.sub_parse(sub['sub_link'])
-        if not configs:
-            bot.send_message(call.message.chat.id, MESSAGES['ERROR_CONFIG_NOT_FOUND'])
-            return
-        if not configs['trojan']:
-            bot.send_message(call.message.chat.id, MESSAGES['ERROR_CONFIG_NOT_FOUND'])
-            return
-        msgs = configs_template(configs['trojan'])
-        for message in msgs:
-            if message:
-                bot.send_message(call.message.chat.id, f"{message}",
-                                 reply_markup=main_menu_keyboard_markup())
+        return
+    bot.edit_message_text(chat_id=call.message.chat.id, message_id=call.message.message_id,
+                          text=MESSAGES['PLANS_LIST'], reply_markup=plans_list_markup(plans))
 
-    # User Configs - Subscription Configs Callback
-    elif key == "conf_sub_url":
-        sub = utils.sub_links(value)
-        if not sub:
-            bot.send_message(call.message.chat.id, MESSAGES['UNKNOWN_ERROR'])
-            return
-        qr_code = utils.txt_to_qr(sub['sub_link'])
-        if not qr_code:
-            bot.send_message(call.message.chat.id, MESSAGES['UNKNOWN_ERROR'])
-            return
-        bot.send_photo(
-            call.message.chat.id,
-            photo=qr_code,
-            caption=f"{KEY_MARKUP['CONFIGS_SUB']}\n<code>{sub['sub_link']}</code>",
-            reply_markup=main_menu_keyboard_markup()
-        )
-    # User Configs - Base64 Subscription Configs Callback
-    elif key == "conf_sub_url_b64":
-        sub = utils.sub_links(value)
-        if not sub:
-            bot.send_message(call.message.chat.id, MESSAGES['UNKNOWN_ERROR'])
-            return
-        qr_code = utils.txt_to_qr(sub['sub_link_b64'])
-        if not qr_code:
-            bot.send_message(call.message.chat.id, MESSAGES['UNKNOWN_ERROR'])
-            return
-        bot.send_photo(
-            call.message.chat.id,
-            photo=qr_code,
-            caption=f"{KEY_MARKUP['CONFIGS_SUB_B64']}\n<code>{sub['sub_link_b64']}</code>",
-            reply_markup=main_menu_keyboard_markup()
-        )
-    # User Configs - Subscription Configs For Clash Callback
-    elif key == "conf_clash":
-        sub = utils.sub_links(value)
-        if not sub:
-            bot.send_message(call.message.chat.id, MESSAGES['UNKNOWN_ERROR'])
-            return
-        qr_code = utils.txt_to_qr(sub['clash_configs'])
-        if not qr_code:
-            bot.send_message(call.message.chat.id, MESSAGES['UNKNOWN_ERROR'])
-            return
-        bot.send_photo(
-            call.message.chat.id,
-            photo=qr_code,
-            caption=f"{KEY_MARKUP['CONFIGS_CLASH']}\n<code>{sub['clash_configs']}</code>",
-            reply_markup=main_menu_keyboard_markup()
-        )
-    # User Configs - Subscription Configs For Hiddify Callback
-    elif key == "conf_hiddify":
-        sub = utils.sub_links(value)
-        if not sub:
-            bot.send_message(call.message.chat.id, MESSAGES['UNKNOWN_ERROR'])
-            return
-        qr_code = utils.txt_to_qr(sub['hiddify_configs'])
-        if not qr_code:
-            bot.send_message(call.message.chat.id, MESSAGES['UNKNOWN_ERROR'])
-            return
-        bot.send_photo(
-            call.message.chat.id,
-            photo=qr_code,
-            caption=f"{KEY_MARKUP['CONFIGS_HIDDIFY']}\n<code>{sub['hiddify_configs']}</code>",
-            reply_markup=main_menu_keyboard_markup()
-        )
-
-    elif key == "conf_sub_auto":
-        sub = utils.sub_links(value)
-        if not sub:
-            bot.send_message(call.message.chat.id, MESSAGES['UNKNOWN_ERROR'])
-            return
-        qr_code = utils.txt_to_qr(sub['sub_link_auto'])
-        if not qr_code:
-            bot.send_message(call.message.chat.id, MESSAGES['UNKNOWN_ERROR'])
-            return
-        bot.send_photo(
-            call.message.chat.id,
-            photo=qr_code,
-            caption=f"{KEY_MARKUP['CONFIGS_SUB_AUTO']}\n<code>{sub['sub_link_auto']}</code>",
-            reply_markup=main_menu_keyboard_markup()
-        )
-
-    elif key == "conf_sub_sing_box":
-        sub = utils.sub_links(value)
-        if not sub:
-            bot.send_message(call.message.chat.id, MESSAGES['UNKNOWN_ERROR'])
-            return
-        qr_code = utils.txt_to_qr(sub['sing_box'])
-        if not qr_code:
-            bot.send_message(call.message.chat.id, MESSAGES['UNKNOWN_ERROR'])
-            return
-        bot.send_photo(
-            call.message.chat.id,
-            photo=qr_code,
-            caption=f"{KEY_MARKUP['CONFIGS_SING_BOX']}\n<code>{sub['sing_box']}</code>",
-            reply_markup=main_menu_keyboard_markup()
-        )
-
-    elif key == "conf_sub_full_sing_box":
-        sub = utils.sub_links(value)
-        if not sub:
-            bot.send_message(call.message.chat.id, MESSAGES['UNKNOWN_ERROR'])
-            return
-        qr_code = utils.txt_to_qr(sub['sing_box_full'])
-        if not qr_code:
-            bot.send_message(call.message.chat.id, MESSAGES['UNKNOWN_ERROR'])
-            return
-        bot.send_photo(
-            call.message.chat.id,
-            photo=qr_code,
-            caption=f"{KEY_MARKUP['CONFIGS_FULL_SING_BOX']}\n<code>{sub['sing_box_full']}</code>",
-            reply_markup=main_menu_keyboard_markup()
-        )
-
-    # manual
-    elif key == "msg_manual":
-        settings = utils.all_configs_settings()
-        android_msg = settings['msg_manual_android'] if settings['msg_manual_android'] else MESSAGES['MANUAL_ANDROID']
-        ios_msg = settings['msg_manual_ios'] if settings['msg_manual_ios'] else MESSAGES['MANUAL_IOS']
-        win_msg = settings['msg_manual_windows'] if settings['msg_manual_windows'] else MESSAGES['MANUAL_WIN']
-        mac_msg = settings['msg_manual_mac'] if settings['msg_manual_mac'] else MESSAGES['MANUAL_MAC']
-        linux_msg = settings['msg_manual_linux'] if settings['msg_manual_linux'] else MESSAGES['MANUAL_LIN']
-        if value == 'android':
-            bot.send_message(call.message.chat.id, android_msg, reply_markup=main_menu_keyboard_markup())
-        elif value == 'ios':
-            bot.send_message(call.message.chat.id, ios_msg, reply_markup=main_menu_keyboard_markup())
-        elif value == 'win':
-            bot.send_message(call.message.chat.id, win_msg, reply_markup=main_menu_keyboard_markup())
-        elif value == 'mac':
-            bot.send_message(call.message.chat.id, mac_msg, reply_markup=main_menu_keyboard_markup())
-        elif value == 'lin':
-            bot.send_message(call.message.chat.id, linux_msg, reply_markup=main_menu_keyboard_markup())
-
-
-
-
-
-    # ----------------------------------- Back Area -----------------------------------
-    # Back To User Menu
-    elif key == "back_to_user_panel":
-        bot.edit_message_reply_markup(call.message.chat.id, call.message.message_id,
-                                      reply_markup=user_info_markup(value))
-        
 
-    # Back To Plans
-    elif key == "back_to_plans":
-        plans = USERS_DB.find_plan(server_id=selected_server_id)
-        if not plans:
-            bot.send_message(call.message.chat.id, MESSAGES['UNKNOWN_ERROR'],
-                             reply_markup=main_menu_keyboard_markup())
-            return
-        bot.edit_message_text(chat_id=call.message.chat.id, message_id=call.message.message_id,
-                              text=MESSAGES['PLANS_LIST'], reply_markup=plans_list_markup(plans))
-
-    # Back To Renewal Plans
-    elif key == "back_to_renewal_plans":
-        plans = USERS_DB.find_plan(server_id=selected_server_id)
-        if not plans:
-            bot.send_message(call.message.chat.id, MESSAGES['UNKNOWN_ERROR'],
-                             reply_markup=main_menu_keyboard_markup())
-            return
-        # bot.edit_message_reply_markup(call.message.chat.id, call.message.message_id,
-        #                               reply_markup=plans_list_markup(plans, renewal=True,uuid=value))
-        update_info_subscription(call.message, value,plans_list_markup(plans, renewal=True,uuid=value))
-    
-    elif key == "back_to_servers":
-        servers = USERS_DB.select_servers()
-        server_list = []
-        if not servers:
-            bot.send_message(message.chat.id, MESSAGES['SERVERS_NOT_FOUND'], reply_markup=main_menu_keyboard_markup())
-            return
-        for server in servers:
-            user_index = 0
-            #if server['status']:
-            users_list = api.select(server['url'] + API_PATH)
-            if users_list:
-                user_index = len(users_list)
-            if server['user_limit'] > user_index:
-                server_list.append([server,True])
-            else:
-                server_list.append([server,False])
-                
-        # bad request telbot api
-        # bot.edit_message_text(chat_id=message.chat.id, message_id=msg_wait.message_id,
-        #                                   text= MESSAGES['SERVERS_LIST'], reply_markup=servers_list_markup(server_list))
-        #bot.delete_message(message.chat.id, msg_wait.message_id)
-        bot.edit_message_text(reply_markup=servers_list_markup(server_list), chat_id=call.message.chat.id, message_id=call.message.message_id,
-                                      text=MESSAGES['SERVERS_LIST'])
-        
+# Back To Renewal Plans
+@callbacks.register("back_to_renewal_plans")
+def callback_back_to_renewal_plans(call: CallbackQuery, value):
+    plans = USERS_DB.find_plan(server_id=selected_server_id)
+    if not plans:
+        bot.send_message(call.message.chat.id, MESSAGES['UNKNOWN_ERROR'],
+                         reply_markup=main_menu_keyboard_markup())
+        return
+    # bot.edit_message_reply_markup(call.message.chat.id, call.message.message_id,
+    #                               reply_markup=plans_list_markup(plans, renewal=True,uuid=value))
+    update_info_subscription(call.message, value,plans_list_markup(plans, renewal=True,uuid=value))
 
-    # Delete Message
-    elif key == "del_msg":
-        bot.delete_message(call.message.chat.id, call.message.message_id)
 
-    # Invalid Command
-    else:
+@callbacks.register("back_to_servers")
+def callback_back_to_servers(call: CallbackQuery, value):
+    servers = USERS_DB.select_servers()
+    server_list = []
+    if not servers:
+        bot.send_message(message.chat.id, MESSAGES['SERVERS_NOT_FOUND'], reply_markup=main_menu_keyboard_markup())
+        return
+    for server in servers:
+        user_index = 0
+        #if server['status']:
+        users_list = api.select(server['url'] + API_PATH)
+        if users_list:
+            user_index = len(users_list)
+        if server['user_limit'] > user_index:
+            server_list.append([server,True])
+        else:
+            server_list.append([server,False])
+
+    # bad request telbot api
+    # bot.edit_message_text(chat_id=message.chat.id, message_id=msg_wait.message_id,
+    #                                   text= MESSAGES['SERVERS_LIST'], reply_markup=servers_list_markup(server_list))
+    #bot.delete_message(message.chat.id, msg_wait.message_id)
+    bot.edit_message_text(reply_markup=servers_list_markup(server_list), chat_id=call.message.chat.id, message_id=call.message.message_id,
+                                  text=MESSAGES['SERVERS_LIST'])
+
+
+# Delete Message
+@callbacks.register("del_msg")
+def callback_del_msg(call: CallbackQuery, value):
+    bot.delete_message(call.message.chat.id, call.message.message_id)
+
+
+# Callback Handler for Inline Buttons
+@bot.callback_query_handler(func=lambda call: True)
+def callback_query(call: CallbackQuery):
+    bot.answer_callback_query(call.id, MESSAGES['WAIT'])
+    bot.clear_step_handler(call.message)
+    if is_user_banned(call.message.chat.id):
+        return
+    # Split Callback Data to Key(Command) and UUID
+    data = call.data.split(':')
+    key = data[0]
+    value = data[1]
+    if not callbacks.dispatch(key, call, value):
         bot.answer_callback_query(call.id, MESSAGES['ERROR_INVALID_COMMAND'])
 
 
@@ -1136,7 +1228,7 @@ def start_bot(message: Message):
 
     MESSAGES['WELCOME'] = MESSAGES['WELCOME'] if not settings['msg_user_start'] else settings['msg_user_start']
     
-    if USERS_DB.find_user(telegram_id=message.chat.id):
+    if USERS_DB.is_registered_user(message.chat.id):
         edit_name= USERS_DB.edit_user(telegram_id=message.chat.id,full_name=message.from_user.full_name)
         edit_username = USERS_DB.edit_user(telegram_id=message.chat.id,username=message.from_user.username)
         bot.send_message(message.chat.id, MESSAGES['WELCOME'], reply_markup=main_menu_keyboard_markup())
@@ -1162,7 +1254,7 @@ def start_bot(message: Message):
 
 
 # If user is not in users table, request /start
-@bot.message_handler(func=lambda message: not USERS_DB.find_user(telegram_id=message.chat.id))
+@bot.message_handler(func=lambda message: not USERS_DB.is_registered_user(message.chat.id))
 def not_in_users_table(message: Message):
     if is_user_banned(message.chat.id):
         return
@@ -1180,8 +1272,7 @@ def subscription_status(message: Message):
     join_status = is_user_in_channel(message.chat.id)
     if not join_status:
         return
-    non_order_subs = utils.non_order_user_info(message.chat.id)
-    order_subs = utils.order_user_info(message.chat.id)
+    non_order_subs, order_subs = utils.user_subscriptions_info(message.chat.id)
 
     if not non_order_subs and not order_subs:
         bot.send_message(message.chat.id, MESSAGES['SUBSCRIPTION_NOT_FOUND'], reply_markup=main_menu_keyboard_markup())
@@ -1401,7 +1492,11 @@ def cancel(message: Message):
 
 
 # *********************************** Main Area ***********************************
-def start():
+# Bot start commands, welcome message and saved handlers - shared by all runtimes
+def setup():
+    # Polling gets no updates while a webhook is set - webhook runtime registers its own
+    if BOT_RUNTIME != "webhook":
+        bot.remove_webhook()
     # Bot Start Commands
     try:
         bot.set_my_commands([
@@ -1417,6 +1512,13 @@ def start():
             bot.send_message(admin, MESSAGES['WELCOME_TO_ADMIN'])
         except Exception as e:
             logging.warning(f"Error in send message to admin {admin}: {e}")
-    bot.enable_save_next_step_handlers()
+    # Registered and banned users for message filters
+    USERS_DB.user_sets()
+    bot.next_step_backend = NextStepStore("UserBot")
     bot.load_next_step_handlers()
+
+
+# Start Bot
+def start():
+    setup()
     bot.infinity_polling()
@@ -5,8 +5,10 @@ from UserBot.content import KEY_MARKUP, MESSAGES
 from UserBot.content import MESSAGES
 from Utils.utils import rial_to_toman,all_configs_settings
 from Utils.api import *
+from Shared.markup_cache import cached_markup
 
 # Main Menu Reply Keyboard Markup
+@cached_markup(settings=True)
 def main_menu_keyboard_markup():
     markup = ReplyKeyboardMarkup(row_width=3, resize_keyboard=True)
     markup.add(KeyboardButton(KEY_MARKUP['SUBSCRIPTION_STATUS']))
@@ -168,6 +170,7 @@ def notify_to_admin_markup(user):
     markup.add(InlineKeyboardButton(f"{name}", callback_data=f"bot_user_info:{user['telegram_id']}"))
     return markup
 
+@cached_markup()
 def send_ticket_to_admin():
     markup = InlineKeyboardMarkup()
     markup.row_width = 1
@@ -186,12 +189,14 @@ def answer_to_user_markup(user,user_id):
     markup.add(InlineKeyboardButton(KEY_MARKUP['ANSWER'], callback_data=f"users_bot_send_message_by_admin:{user_id}"))
     return markup
 
+@cached_markup()
 def cancel_markup():
     markup = ReplyKeyboardMarkup(row_width=3, resize_keyboard=True)
     markup.add(KeyboardButton(KEY_MARKUP['CANCEL']))
     return markup
 
 
+@cached_markup()
 def wallet_info_markup():
     markup = InlineKeyboardMarkup()
     markup.row_width = 1
@@ -219,6 +224,7 @@ def force_join_channel_markup(channel_id):
     return markup
 
 
+@cached_markup()
 def users_bot_management_settings_panel_manual_markup():
     markup = InlineKeyboardMarkup()
     markup.row_width = 1
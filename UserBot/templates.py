@@ -5,13 +5,9 @@ from Utils.utils import rial_to_toman, toman_to_rial,all_configs_settings
 from Database.dbManager import USERS_DB
 # User Subscription Info Template
 def user_info_template(sub_id, server, usr, header=""):
-    settings = USERS_DB.find_bool_config(key='visible_hiddify_hyperlink')
-    if settings:
-        settings = settings[0]
-        if settings['value']:
-            user_name = f"<a href='{usr['link']}'> {usr['name']} </a>"
-        else:
-            user_name = usr['name']
+    settings = all_configs_settings()
+    if settings.get('visible_hiddify_hyperlink'):
+        user_name = f"<a href='{usr['link']}'> {usr['name']} </a>"
     else:
         user_name = usr['name']
     # if usr['enable'] == 1:
@@ -4,15 +4,86 @@ import json
 import logging
 from urllib.parse import urlparse
 import datetime
+import threading
+import time
 import requests
-from config import API_PATH
+from requests.adapters import HTTPAdapter
+from config import API_PATH, API_POOL_SIZE, API_CONNECT_TIMEOUT, API_READ_TIMEOUT, API_MAX_RETRIES, \
+    API_USERS_CACHE_TTL
 import Utils
+from Utils import mirror
+
+# (connect, read) timeout for every panel request
+API_TIMEOUT = (API_CONNECT_TIMEOUT, API_READ_TIMEOUT)
+
+# Keep-alive sessions, one per panel (scheme://host:port)
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+# Users list cache - {(url, endpoint): (fetch_time, users)}
+_users_cache = {}
+_users_cache_lock = threading.Lock()
+_users_cache_stats = {'hit': 0, 'miss': 0, 'invalidate': 0}
 
 
 # Document: https://github.com/hiddify/hiddify-config/discussions/3209
 # It not in uses now, but it will be used in the future.
 
 
+# Get pooled session for the panel of this url
+def get_session(url):
+    parsed = urlparse(url)
+    server_key = f"{parsed.scheme}://{parsed.netloc}"
+    session = _sessions.get(server_key)
+    if session:
+        return session
+    with _sessions_lock:
+        session = _sessions.get(server_key)
+        if not session:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=API_POOL_SIZE, max_retries=API_MAX_RETRIES)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _sessions[server_key] = session
+            logging.info(f"New API session for {parsed.netloc} - pool size: {API_POOL_SIZE}")
+    return session
+
+
+# Get cached users list of the server (copies, callers may change them)
+def get_cached_users(url, endpoint="/admin/user/"):
+    if API_USERS_CACHE_TTL <= 0:
+        return None
+    with _users_cache_lock:
+        cached = _users_cache.get((url, endpoint))
+        if cached and time.monotonic() - cached[0] < API_USERS_CACHE_TTL:
+            _users_cache_stats['hit'] += 1
+            return [dict(user) for user in cached[1]]
+        _users_cache_stats['miss'] += 1
+    return None
+
+
+def set_cached_users(url, users, endpoint="/admin/user/"):
+    if API_USERS_CACHE_TTL <= 0 or not users:
+        return
+    with _users_cache_lock:
+        _users_cache[(url, endpoint)] = (time.monotonic(), [dict(user) for user in users])
+
+
+# Drop cached users list of the server (after insert/update)
+def invalidate_users_cache(url):
+    with _users_cache_lock:
+        for key in [key for key in _users_cache if key[0] == url]:
+            del _users_cache[key]
+        _users_cache_stats['invalidate'] += 1
+
+
+def users_cache_stats():
+    with _users_cache_lock:
+        stats = dict(_users_cache_stats)
+        stats['servers'] = len(_users_cache)
+    return stats
+
+
 def get_auth_headers(url):
     """
     Helper function to generate headers with Hiddify-API-Key.
@@ -52,7 +123,28 @@ def get_auth_headers(url):
     return {'Content-Type': 'application/json'}
 
 
+# Users list of the server - memory cache, then local mirror while it is fresh, then panel
 def select(url, endpoint="/admin/user/"):
+    cached_users = get_cached_users(url, endpoint)
+    if cached_users:
+        return cached_users
+    if endpoint == "/admin/user/" and mirror.is_fresh(url):
+        users = Utils.utils.dict_process(url, Utils.utils.users_to_dict(mirror.get_users(url)))
+        if users:
+            set_cached_users(url, users, endpoint)
+            return users
+    users = fetch_users(url, endpoint)
+    if users is None:
+        return None
+    if endpoint == "/admin/user/":
+        mirror.save_users(url, users)
+    users = Utils.utils.dict_process(url, Utils.utils.users_to_dict(users))
+    set_cached_users(url, users, endpoint)
+    return users
+
+
+# Users list of the server as returned by panel - None on error
+def fetch_users(url, endpoint="/admin/user/"):
     try:
         # url passed here usually is SERVER_URL + API_PATH
         # API_PATH is now /api/v2
@@ -178,7 +270,7 @@ def select(url, endpoint="/admin/user/"):
         
         full_url = f"{real_url}{endpoint}"
         
-        response = requests.get(full_url, headers=headers)
+        response = get_session(full_url).get(full_url, headers=headers, timeout=API_TIMEOUT)
         
         if response.status_code == 200:
             # The new API returns a list of users directly or inside a key?
@@ -186,7 +278,7 @@ def select(url, endpoint="/admin/user/"):
             # Old API: returned a dict or list?
             # Old code: Utils.utils.dict_process(url, Utils.utils.users_to_dict(response.json()))
             # users_to_dict expects a list of dicts.
-            return Utils.utils.dict_process(url, Utils.utils.users_to_dict(response.json()))
+            return response.json()
         else:
             logging.error(f"API Select Error: {response.status_code} - {response.text}")
             return None
@@ -195,6 +287,7 @@ def select(url, endpoint="/admin/user/"):
         logging.error("API error: %s" % e)
         return None
 
+# Single user is always read from panel - mirror is only a fallback while panel is unreachable
 def find(url, uuid, endpoint="/admin/user/"):
     try:
         headers = get_auth_headers(url)
@@ -206,16 +299,28 @@ def find(url, uuid, endpoint="/admin/user/"):
         # V2: GET /admin/user/{uuid}/
         full_url = f"{real_url}{endpoint}{uuid}/"
         
-        response = requests.get(full_url, headers=headers)
+        response = get_session(full_url).get(full_url, headers=headers, timeout=API_TIMEOUT)
         
         if response.status_code == 200:
             return response.json()
-        else:
-            logging.error(f"API Find Error: {response.status_code} - {response.text}")
-            return None
+        logging.error(f"API Find Error: {response.status_code} - {response.text}")
+        # 5xx - panel is down (e.g. behind a reverse proxy), user may still be in the mirror
+        if response.status_code >= 500:
+            return find_in_mirror(url, uuid, endpoint)
+        return None
     except Exception as e:
         logging.error("API error: %s" % e)
+        return find_in_mirror(url, uuid, endpoint)
+
+
+# User from fresh mirror while panel is unreachable - None if not found
+def find_in_mirror(url, uuid, endpoint="/admin/user/"):
+    if endpoint != "/admin/user/" or not mirror.is_fresh(url):
         return None
+    user = mirror.get_user(url, uuid)
+    if user:
+        logging.warning(f"User [{uuid}] served from panel mirror, synced {round(mirror.staleness(url))}s ago")
+    return user
 
 def insert(url, name, usage_limit_GB, package_days, last_reset_time=None, added_by_uuid=None, mode="no_reset",
             last_online="1-01-01 00:00:00", telegram_id=None,
@@ -268,9 +373,19 @@ def insert(url, name, usage_limit_GB, package_days, last_reset_time=None, added_
             
         full_url = f"{real_url}{endpoint}"
         
-        response = requests.post(full_url, data=jdata, headers=headers)
+        response = get_session(full_url).post(full_url, data=jdata, headers=headers, timeout=API_TIMEOUT)
         
         if response.status_code == 200:
+            invalidate_users_cache(url)
+            # Mirror keeps the user as stored by panel (with defaults filled), not the request payload
+            try:
+                user = response.json()
+            except ValueError:
+                user = None
+            if not isinstance(user, dict) or user.get('uuid') != new_uuid:
+                user = find(url, new_uuid)
+            if user:
+                mirror.save_user(url, user)
             # Return the UUID
             return new_uuid
         else:
@@ -298,9 +413,18 @@ def update(url, uuid, endpoint="/admin/user/", **kwargs):
         data = kwargs
         jdata = json.dumps(data)
         
-        response = requests.patch(full_url, data=jdata, headers=headers)
+        response = get_session(full_url).patch(full_url, data=jdata, headers=headers, timeout=API_TIMEOUT)
         
         if response.status_code == 200:
+            invalidate_users_cache(url)
+            try:
+                user = response.json()
+            except ValueError:
+                user = None
+            if not isinstance(user, dict) or user.get('uuid') != uuid:
+                user = find(url, uuid)
+            if user:
+                mirror.save_user(url, user)
             return uuid
         else:
             logging.error(f"API Update Error: {response.status_code} - {response.text}")
@@ -321,7 +445,7 @@ def get_server_status(url):
             
         full_url = f"{real_url}/admin/server_status/"
         
-        response = requests.get(full_url, headers=headers)
+        response = get_session(full_url).get(full_url, headers=headers, timeout=API_TIMEOUT)
         
         if response.status_code == 200:
             return response.json()
@@ -0,0 +1,170 @@
+# Description: Rate limited sending and background broadcast of messages to users bot users
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from telebot.apihelper import ApiTelegramException
+from Database.dbManager import USERS_DB
+from config import BROADCAST_RATE, BROADCAST_PROGRESS_EVERY, TELEGRAM_MAX_RETRIES, BROADCAST_WORKERS, \
+    TELEGRAM_CHAT_INTERVAL
+
+
+# Token bucket - allow `rate` messages per second with bursts up to `capacity`
+class TokenBucket:
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity if capacity else rate
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self.paused_until = 0
+        self.lock = threading.Lock()
+
+    # Block until a token is available
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                if now < self.paused_until:
+                    wait = self.paused_until - now
+                else:
+                    self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+                    self.updated_at = now
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        return
+                    wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    # Stop all senders for a while (Telegram 429 - retry_after)
+    def pause(self, seconds):
+        with self.lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+            self.tokens = 0
+
+
+# Per chat limit - at least `interval` seconds between messages to the same chat.
+# Only recently used chats are kept (older ones can't be limited anymore).
+class ChatLimiter:
+    def __init__(self, interval, size=10000):
+        self.interval = interval
+        self.size = size
+        # {chat_id: time of last (or reserved) message}
+        self.last_sent = OrderedDict()
+        self.lock = threading.Lock()
+
+    # Block until chat can get the next message
+    def acquire(self, chat_id):
+        with self.lock:
+            now = time.monotonic()
+            send_at = max(now, self.last_sent.get(chat_id, 0) + self.interval)
+            self.last_sent[chat_id] = send_at
+            self.last_sent.move_to_end(chat_id)
+            while len(self.last_sent) > self.size:
+                self.last_sent.popitem(last=False)
+        if send_at > now:
+            time.sleep(send_at - now)
+
+
+# Shared limiters for all bulk messages of users bot
+users_bot_limiter = TokenBucket(BROADCAST_RATE)
+users_bot_chat_limiter = ChatLimiter(TELEGRAM_CHAT_INTERVAL)
+
+
+# Send message with rate limit and retry on 429 - return True if sent
+def send_message_with_retry(tbot, chat_id, text, limiter=users_bot_limiter, chat_limiter=users_bot_chat_limiter,
+                            **kwargs):
+    for attempt in range(TELEGRAM_MAX_RETRIES + 1):
+        if chat_limiter:
+            chat_limiter.acquire(chat_id)
+        if limiter:
+            limiter.acquire()
+        try:
+            tbot.send_message(chat_id, text, **kwargs)
+            return True
+        except ApiTelegramException as e:
+            if e.error_code != 429:
+                logging.warning(f"Error in send message to user {chat_id}: {e}")
+                return False
+            retry_after = 1
+            if e.result_json and e.result_json.get('parameters'):
+                retry_after = e.result_json['parameters'].get('retry_after', 1)
+            logging.warning(f"Too many requests, retry after {retry_after}s (user {chat_id})")
+            if limiter:
+                limiter.pause(retry_after)
+            else:
+                time.sleep(retry_after)
+        except Exception as e:
+            logging.warning(f"Error in send message to user {chat_id}: {e}")
+            return False
+    return False
+
+
+# Run broadcast from this thread with BROADCAST_WORKERS senders - every recipient is recorded,
+# so a resumed broadcast continues with users that did not get it yet.
+# on_progress(broadcast) and on_finish(broadcast) are called with the broadcast row
+def run_broadcast(broadcast_id, tbot, on_progress=None, on_finish=None):
+    broadcasts = USERS_DB.find_broadcast(id=broadcast_id)
+    if not broadcasts:
+        return
+    broadcast = broadcasts[0]
+    users = USERS_DB.select_broadcast_pending_users(broadcast_id)
+    counts = USERS_DB.count_broadcast_recipients(broadcast_id)
+    if users is None or counts is None:
+        logging.error(f"Broadcast [{broadcast_id}] stopped, users could not be loaded")
+        return
+    broadcast['sent'], broadcast['failed'] = counts
+    logging.info(f"Broadcast [{broadcast_id}] started - {len(users)} users left")
+    lock = threading.Lock()
+    # queued users are bounded, so a large broadcast does not create all tasks at once
+    slots = threading.BoundedSemaphore(BROADCAST_WORKERS * 2)
+
+    def send(user):
+        try:
+            sent = send_message_with_retry(tbot, user['telegram_id'], broadcast['message'])
+            USERS_DB.add_broadcast_recipient(broadcast_id, user['id'], sent)
+            with lock:
+                broadcast['sent' if sent else 'failed'] += 1
+                done = broadcast['sent'] + broadcast['failed']
+                if done % BROADCAST_PROGRESS_EVERY:
+                    return
+                USERS_DB.edit_broadcast(broadcast_id, sent=broadcast['sent'], failed=broadcast['failed'])
+                if on_progress:
+                    try:
+                        on_progress(broadcast)
+                    except Exception as e:
+                        logging.warning(f"Error in broadcast [{broadcast_id}] progress: {e}")
+        finally:
+            slots.release()
+
+    with ThreadPoolExecutor(max_workers=BROADCAST_WORKERS, thread_name_prefix=f"broadcast_{broadcast_id}") as executor:
+        for user in users:
+            slots.acquire()
+            executor.submit(send, user)
+    broadcast['status'] = "done"
+    USERS_DB.edit_broadcast(broadcast_id, sent=broadcast['sent'], failed=broadcast['failed'],
+                            status=broadcast['status'])
+    logging.info(f"Broadcast [{broadcast_id}] finished - sent: {broadcast['sent']} failed: {broadcast['failed']}")
+    if on_finish:
+        try:
+            on_finish(broadcast)
+        except Exception as e:
+            logging.warning(f"Error in broadcast [{broadcast_id}] summary: {e}")
+
+
+# Start broadcast in background thread
+def start_broadcast(broadcast_id, tbot, on_progress=None, on_finish=None):
+    thread = threading.Thread(target=run_broadcast, args=(broadcast_id, tbot, on_progress, on_finish),
+                              name=f"broadcast_{broadcast_id}", daemon=True)
+    thread.start()
+    return thread
+
+
+# Resume broadcasts that were interrupted (bot restart)
+def resume_broadcasts(tbot, on_progress=None, on_finish=None):
+    broadcasts = USERS_DB.find_broadcast(status="running")
+    if not broadcasts:
+        return
+    for broadcast in broadcasts:
+        logging.info(f"Resume broadcast [{broadcast['id']}]")
+        start_broadcast(broadcast['id'], tbot, on_progress, on_finish)
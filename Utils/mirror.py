@@ -0,0 +1,103 @@
+# Description: Local mirror of panel users - pulled from every server in background and kept in database.
+# Users lists are served from the mirror while it is fresh (synced in last PANEL_MIRROR_MAX_AGE seconds, age is shown
+# to admin), single users are read from panel and from the mirror only while panel is unreachable,
+# writes of the bot are applied to the mirror right after the panel accepts them.
+import json
+import logging
+import threading
+import time
+from Database.dbManager import USERS_DB
+from config import API_PATH, PANEL_MIRROR_ENABLED, PANEL_MIRROR_SYNC_INTERVAL, PANEL_MIRROR_MAX_AGE
+
+
+# Seconds since last sync of server - None if it is never synced
+def staleness(url):
+    synced_at = USERS_DB.find_panel_sync(url)
+    if synced_at is None:
+        return None
+    return time.time() - synced_at
+
+
+def is_fresh(url):
+    if not PANEL_MIRROR_ENABLED:
+        return False
+    age = staleness(url)
+    return age is not None and age <= PANEL_MIRROR_MAX_AGE
+
+
+# Users of server as returned by panel
+def get_users(url):
+    rows = USERS_DB.select_panel_users(url)
+    if rows is None:
+        return None
+    return [json.loads(data) for data in rows]
+
+
+def get_user(url, uuid):
+    data = USERS_DB.find_panel_user(url, uuid)
+    if not data:
+        return None
+    return json.loads(data)
+
+
+# Replace users of server with the list fetched from panel (only changed rows are written)
+def save_users(url, users):
+    if not PANEL_MIRROR_ENABLED:
+        return None
+    users = {user['uuid']: (user.get('name'), json.dumps(user, sort_keys=True)) for user in users}
+    return USERS_DB.sync_panel_users(url, users, time.time())
+
+
+# Write-through of one user as stored by panel (after insert/update)
+def save_user(url, user):
+    if not PANEL_MIRROR_ENABLED:
+        return False
+    return USERS_DB.set_panel_user(url, user['uuid'], user.get('name'), json.dumps(user, sort_keys=True))
+
+
+# Sync state of all servers - [{url, age, users}]
+def status():
+    rows = USERS_DB.select_panel_sync()
+    if not rows:
+        return []
+    now = time.time()
+    return [{'url': row['url'], 'age': round(now - row['synced_at']), 'users': row['users']} for row in rows]
+
+
+# Pull users list of every server into mirror
+def sync_servers():
+    # api imports this module
+    from Utils import api
+    servers = USERS_DB.select_servers()
+    if not servers:
+        return
+    for server in servers:
+        url = server['url'] + API_PATH
+        users = api.fetch_users(url)
+        if users is None:
+            age = staleness(url)
+            logging.warning(f"Panel mirror sync failed for server [{server['id']}], "
+                            f"last sync: {round(age) if age is not None else 'never'}s ago")
+            continue
+        result = save_users(url, users)
+        if result:
+            logging.info(f"Panel mirror synced for server [{server['id']}] - "
+                         f"{len(users)} users, {result[0]} changed, {result[1]} deleted")
+
+
+def sync_worker():
+    while True:
+        try:
+            sync_servers()
+        except Exception as e:
+            logging.error(f"Error while syncing panel mirror \n Error:{e}")
+        time.sleep(PANEL_MIRROR_SYNC_INTERVAL)
+
+
+# Start background sync - once per process
+def start_sync():
+    if not PANEL_MIRROR_ENABLED:
+        return None
+    thread = threading.Thread(target=sync_worker, name="panel_mirror_sync", daemon=True)
+    thread.start()
+    return thread
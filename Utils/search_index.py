@@ -0,0 +1,77 @@
+# Description: In-memory search index of panel users of one server.
+# Uuid hash map and n-gram (1 to 3 chars) index of lowercase names - the n-grams are built again only
+# when names of the users list change, fresh user data is attached with with_users().
+import hashlib
+from collections import defaultdict
+
+# Longest indexed gram - longer queries are matched by their trigrams and verified
+NGRAM_SIZE = 3
+
+
+def name_grams(name, size):
+    return {name[i:i + size] for i in range(len(name) - size + 1)}
+
+
+# Hash of uuids and names of users (in order) - same fingerprint, same n-gram index
+def users_fingerprint(users):
+    digest = hashlib.sha1()
+    for user in users:
+        digest.update(f"{user['uuid']}\0{user['name'] or ''}\0".encode())
+    return digest.hexdigest()
+
+
+class UserSearchIndex:
+    def __init__(self, users):
+        self.users = users
+        self.names = [(user['name'] or "").lower() for user in users]
+        self.by_uuid = {user['uuid']: user for user in users}
+        # gram -> positions of users whose name contains it
+        self.grams = defaultdict(set)
+        for position, name in enumerate(self.names):
+            for size in range(1, NGRAM_SIZE + 1):
+                for gram in name_grams(name, size):
+                    self.grams[gram].add(position)
+
+    def __len__(self):
+        return len(self.users)
+
+    # Same index for a newer list with the same fingerprint (only user data changed)
+    def with_users(self, users):
+        index = object.__new__(UserSearchIndex)
+        index.users = users
+        index.names = self.names
+        index.grams = self.grams
+        index.by_uuid = {user['uuid']: user for user in users}
+        return index
+
+    def find(self, uuid):
+        return self.by_uuid.get(uuid)
+
+    # Rank of name for query - exact name, name prefix, word prefix, then any part of name
+    @staticmethod
+    def rank(name, query):
+        if name == query:
+            return 0
+        if name.startswith(query):
+            return 1
+        if f" {query}" in name or f"_{query}" in name or f"-{query}" in name:
+            return 2
+        return 3
+
+    # Users whose name contains query, best matches first - return (users, hits)
+    def search(self, query, limit=None):
+        query = query.lower()
+        if not query:
+            return [], 0
+        if len(query) <= NGRAM_SIZE:
+            candidates = self.grams.get(query, set())
+        else:
+            postings = sorted((self.grams.get(gram, set()) for gram in name_grams(query, NGRAM_SIZE)), key=len)
+            candidates = set.intersection(*postings) if postings[0] else set()
+        matches = [position for position in candidates if query in self.names[position]]
+        matches.sort(key=lambda position: (self.rank(self.names[position], query), len(self.names[position]),
+                                           self.names[position]))
+        hits = len(matches)
+        if limit:
+            matches = matches[:limit]
+        return [self.users[position] for position in matches], hits
@@ -15,12 +15,25 @@ import requests
 from config import PANEL_URL, BACKUP_LOC, CLIENT_TOKEN, USERS_DB_LOC,RECEIPTIONS_LOC,BOT_BACKUP_LOC, API_PATH,LOG_DIR
 import AdminBot.templates
 from Utils import api
+from Utils import mirror
+from Utils.search_index import UserSearchIndex, users_fingerprint
+from Shared.dispatch import admin_callbacks, user_callbacks
 from version import __version__
 import zipfile
 import shutil
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError as FuturesTimeoutError
+from config import SERVERS_FAN_OUT_WORKERS, SERVERS_FAN_OUT_DEADLINE, QR_CACHE_LOC, QR_CACHE_SIZE, \
+    QR_DISK_CACHE_SIZE, QR_FILE_ID_CACHE_SIZE, SUB_PARSE_CACHE_TTL, SUB_PARSE_CACHE_SIZE, PANEL_BACKUP_CHUNK_SIZE, \
+    PANEL_BACKUP_DEADLINE, PANEL_BACKUP_WORKERS
+import hashlib
+import threading
+import time
+from collections import OrderedDict, namedtuple
 # Global variables
-# Make Session for requests
-session = requests.session()
+# Shared thread pool for parallel requests to servers
+fan_out_executor = ThreadPoolExecutor(max_workers=SERVERS_FAN_OUT_WORKERS, thread_name_prefix="servers_fan_out")
+# Panel backups - separate pool, a slow backup download never holds a worker of user searches
+backup_executor = ThreadPoolExecutor(max_workers=PANEL_BACKUP_WORKERS, thread_name_prefix="panel_backup")
 # Base panel URL - example: https://panel.example.com
 BASE_URL = urlparse(PANEL_URL).scheme + "://" + urlparse(PANEL_URL).netloc
 
@@ -32,9 +45,8 @@ BASE_URL = urlparse(PANEL_URL).scheme + "://" + urlparse(PANEL_URL).netloc
 # Get request - return request object
 def get_request(url):
     logging.info(f"GET Request to {privacy_friendly_logging_request(url)}")
-    global session
     try:
-        req = session.get(url)
+        req = api.get_session(url).get(url, timeout=api.API_TIMEOUT)
         logging.info(f"GET Request to {privacy_friendly_logging_request(url)} - Status Code: {req.status_code}")
         return req
     except requests.exceptions.ConnectionError as e:
@@ -54,9 +66,8 @@ def get_request(url):
 # Post request - return request object
 def post_request(url, data):
     logging.info(f"POST Request to {privacy_friendly_logging_request(url)} - Data: {data}")
-    global session
     try:
-        req = session.post(url, data=data)
+        req = api.get_session(url).post(url, data=data, timeout=api.API_TIMEOUT)
         return req
     except requests.exceptions.ConnectionError as e:
         logging.exception(f"Connection Exception: {e}")
@@ -163,16 +174,71 @@ def dict_process(url, users_dict, sub_id=None, server_id=None):
     return users_list
 
 
+# Run func(server) on all servers in parallel with a global deadline
+# return (results, timed_out) - results: [(server, result)] in servers order, only for non-empty results
+# first_match: return as soon as one server has a result (e.g. uuid search)
+# executor: pool to run on - long jobs (backups) use their own pool, so searches are not queued behind them
+def servers_fan_out(servers, func, deadline=SERVERS_FAN_OUT_DEADLINE, first_match=False, executor=None):
+    if not servers:
+        return [], []
+    executor = executor or fan_out_executor
+    futures = {executor.submit(func, server): index for index, server in enumerate(servers)}
+    done = {}
+    try:
+        for future in as_completed(futures, timeout=deadline):
+            index = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                logging.error(f"Error while requesting server {servers[index]['title']} \n Error:{e}")
+                result = None
+            done[index] = result
+            if first_match and result:
+                break
+    except FuturesTimeoutError:
+        pass
+    results = [(servers[index], done[index]) for index in sorted(done) if done[index]]
+    if first_match and results:
+        # other servers are not needed anymore
+        for future in futures:
+            future.cancel()
+        return results, []
+    timed_out = [servers[index] for index in futures.values() if index not in done]
+    for future in futures:
+        future.cancel()
+    if timed_out:
+        logging.warning(f"No response in {deadline}s from servers: {[server['title'] for server in timed_out]}")
+    return results, timed_out
+
+
+# Search indexes of servers - {url: (users fingerprint, index)}
+search_indexes = {}
+
+
+# Search index of server users - n-grams are rebuilt only when uuids or names of the users changed
+def users_search_index(url):
+    users = api.select(url)
+    if not users:
+        return None
+    fingerprint = users_fingerprint(users)
+    cached = search_indexes.get(url)
+    if cached and cached[0] == fingerprint:
+        index = cached[1].with_users(users)
+    else:
+        index = UserSearchIndex(users)
+    search_indexes[url] = (fingerprint, index)
+    return index
+
+
 # Get single user info - return dict of user info
 def user_info(url, uuid):
     logging.info(f"Get info of user single user - {uuid}")
-    lu = api.select(url)
-    if not lu:
+    user = api.find(url, uuid)
+    if not user:
         return False
-    for user in lu:
-        if user['uuid'] == uuid:
-            return user
-    return False
+    # same processed user as in users lists (api.select)
+    users = dict_process(url, users_to_dict([user]))
+    return users[0] if users else False
 
 
 # Get sub links - return dict of sub links
@@ -217,77 +283,143 @@ def sub_links(uuid, url= None):
     return sub
 
 
-# Parse sub links
-def sub_parse(sub):
-    logging.info(f"Parse sub links")
-    res = get_request(sub)
-    if not res or res.status_code != 200:
-        return False
+# Single config of subscription - config[0] is url and config[1] is title
+SubConfig = namedtuple('SubConfig', ['url', 'title', 'protocol'])
+
+SUB_CONFIG_PATTERN = re.compile(r'(vless|vmess|trojan)://[^\n]+')
+SUB_TITLE_PATTERN = re.compile(r'#(.+)$')
+SUB_SNI_PATTERN = re.compile(r'sni=([^&#]+)')
+
+# Parsed subscriptions - bounded LRU cache {sub_link: (expire_time, configs)}
+sub_parse_cache = OrderedDict()
+
+
+# Parse single config line - return SubConfig or None
+def parse_sub_config(url, protocol):
+    if protocol == 'vmess':
+        config_parsed = base64decoder(url.replace("vmess://", ""))
+        if config_parsed:
+            return SubConfig(url, config_parsed['ps'].replace("%20", " "), protocol)
+        return None
+    match = SUB_TITLE_PATTERN.search(url)
+    if not match:
+        return None
+    if protocol == 'trojan':
+        trojan_sni = SUB_SNI_PATTERN.search(url)
+        if trojan_sni and trojan_sni.group(1) == "fake_ip_for_sub_link":
+            return None
+        return SubConfig(url, match.group(1), protocol)
+    return SubConfig(url, match.group(1).replace("%20", " "), protocol)
 
-    urls = re.findall(r'(vless:\/\/[^\n]+)|(vmess:\/\/[^\n]+)|(trojan:\/\/[^\n]+)', res.text)
 
+# Parse sub links - streamed line by line, cached for SUB_PARSE_CACHE_TTL seconds
+def sub_parse(sub):
+    cached = lru_get(sub_parse_cache, sub)
+    if cached and cached[0] > time.monotonic():
+        return cached[1]
+    logging.info(f"Parse sub links")
     config_links = {
         'vless': [],
         'vmess': [],
         'trojan': []
     }
-    for url in urls:
-        if url[0]:
-            match = re.search(r'#(.+)$', url[0])
-            if match:
-                vless_title = match.group(1).replace("%20", " ")
-                config_links['vless'].append([url[0], vless_title])
-        elif url[1]:
-            config = url[1].replace("vmess://", "")
-            config_parsed = base64decoder(config)
-            if config_parsed:
-                vmess_title = config_parsed['ps'].replace("%20", " ")
-                config_links['vmess'].append([url[1], vmess_title])
-        elif url[2]:
-            match = re.search(r'#(.+)$', url[2])
-            if match:
-                trojan_title = match.group(1).replace("%20", " ")
-                trojan_sni = re.search(r'sni=([^&]+)', url[2])
-                if trojan_sni:
-                    if trojan_sni.group(1) == "fake_ip_for_sub_link":
-                        continue
-                config_links['trojan'].append([url[2], match.group(1)])
-        
+    try:
+        res = api.get_session(sub).get(sub, stream=True, timeout=api.API_TIMEOUT)
+        with res:
+            if res.status_code != 200:
+                return False
+            res.encoding = res.encoding or 'utf-8'
+            for line in res.iter_lines(decode_unicode=True):
+                for match in SUB_CONFIG_PATTERN.finditer(line):
+                    config = parse_sub_config(match.group(0), match.group(1))
+                    if config:
+                        config_links[config.protocol].append(config)
+    except requests.exceptions.RequestException as e:
+        logging.exception(f"Connection Exception: {e}")
+        return False
+    lru_set(sub_parse_cache, sub, (time.monotonic() + SUB_PARSE_CACHE_TTL, config_links), SUB_PARSE_CACHE_SIZE)
     return config_links
 
 
-# Backup panel
-def backup_panel(url):
+# Backup panel - stream backup file of panel to disk in chunks
+# server_id is part of the file name (servers on one host are backed up at the same time)
+# return {'file', 'size', 'sha256', 'seconds'} or False
+def backup_panel(url, server_id):
     logging.info(f"Backup panel")
+    started = time.perf_counter()
     BASE_URL = urlparse(url,).scheme + "://" + urlparse(url,).netloc
     dir_panel = urlparse(url).path.split('/')
     backup_url = f"{BASE_URL}/{dir_panel[1]}/{dir_panel[2]}/admin/backup/backupfile/"
 
-    backup_req = get_request(backup_url)
-    if not backup_req or backup_req.status_code != 200:
-        return False
-
     now = datetime.now()
     dt_string = now.strftime("%d-%m-%Y_%H-%M-%S")
 
-    file_name = f"Backup_{urlparse(url,).netloc}_{dt_string}.json"
+    file_name = f"Backup_{urlparse(url,).netloc}_{server_id}_{dt_string}.json"
 
     file_name = os.path.join(BACKUP_LOC, file_name)
     if not os.path.exists(BACKUP_LOC):
-        os.makedirs(BACKUP_LOC)
-    with open(file_name, 'w+') as f:
-        f.write(backup_req.text)
-    return file_name
+        os.makedirs(BACKUP_LOC, exist_ok=True)
+    # written to .part first, so a failed download never leaves a truncated backup
+    part_file_name = f"{file_name}.part"
+    checksum = hashlib.sha256()
+    size = 0
+    try:
+        with api.get_session(backup_url).get(backup_url, timeout=api.API_TIMEOUT, stream=True) as backup_req:
+            logging.info(f"GET Request to {privacy_friendly_logging_request(backup_url)} - "
+                         f"Status Code: {backup_req.status_code}")
+            if backup_req.status_code != 200:
+                return False
+            with open(part_file_name, 'wb') as f:
+                for chunk in backup_req.iter_content(chunk_size=PANEL_BACKUP_CHUNK_SIZE):
+                    # API_TIMEOUT is per read - a panel sending slowly is stopped here
+                    if time.perf_counter() - started > PANEL_BACKUP_DEADLINE:
+                        raise TimeoutError(f"no complete backup in {PANEL_BACKUP_DEADLINE}s")
+                    f.write(chunk)
+                    checksum.update(chunk)
+                    size += len(chunk)
+        os.replace(part_file_name, file_name)
+    except (requests.exceptions.RequestException, OSError) as e:
+        logging.error(f"Error while backup panel {privacy_friendly_logging_request(url)} \n Error:{e}")
+        if os.path.exists(part_file_name):
+            os.remove(part_file_name)
+        return False
+    seconds = round(time.perf_counter() - started, 2)
+    return {'file': file_name, 'size': size, 'sha256': checksum.hexdigest(), 'seconds': seconds}
+
 
-# zip an array of files
-# full backup
+# zip an array of files - files are compressed one by one from disk (zip files are stored as they are)
+# manifest: written to the archive as backup_manifest.json
+def zip_files(files, zip_title, path, manifest=None):
+    zip_file_name = os.path.join(path, zip_title)
+    try:
+        with zipfile.ZipFile(zip_file_name, 'w', compression=zipfile.ZIP_DEFLATED) as zip:
+            for file in files:
+                compress_type = zipfile.ZIP_STORED if file.endswith(".zip") else zipfile.ZIP_DEFLATED
+                zip.write(file, os.path.basename(file), compress_type=compress_type)
+            if manifest:
+                zip.writestr("backup_manifest.json", json.dumps(manifest, indent=4))
+    except OSError as e:
+        logging.error(f"Error while zip backup files \n Error:{e}")
+        return False
+    return zip_file_name
+
+
+# full backup - panels are downloaded in parallel
 def full_backup():
     files = []
+    manifest = []
     servers = USERS_DB.select_servers()
-    for server in servers:
-        file_name = backup_panel(server['url'])
-        if file_name:
-            files.append(file_name)
+    results, timed_out = servers_fan_out(servers, lambda server: backup_panel(server['url'], server['id']),
+                                         deadline=PANEL_BACKUP_DEADLINE, executor=backup_executor)
+    for server, backup in results:
+        files.append(backup['file'])
+        manifest.append(dict(server=server['title'], file=os.path.basename(backup['file']), size=backup['size'],
+                             sha256=backup['sha256'], seconds=backup['seconds']))
+        logging.info(f"Panel backup of server [{server['id']}] - {backup['size']} bytes in {backup['seconds']}s")
+    backed_up = {server['id'] for server, _ in results}
+    failed = [server for server in servers or [] if server['id'] not in backed_up]
+    if failed:
+        logging.warning(f"Panel backup failed for servers: {[server['title'] for server in failed]}")
     backup_bot = backup_json_bot()
     if backup_bot:
         files.append(backup_bot)
@@ -295,7 +427,7 @@ def full_backup():
         now = datetime.now()
         dt_string = now.strftime("%d-%m-%Y_%H-%M-%S")
         zip_title = f"Backup_{dt_string}.zip"
-        zip_file_name = zip_files(files, zip_title,path=BACKUP_LOC)
+        zip_file_name = zip_files(files, zip_title,path=BACKUP_LOC, manifest=manifest)
         if zip_file_name:
             return zip_file_name
     return False
@@ -325,31 +457,23 @@ def system_status():
     }
 
 
-# Search user by name
+# Search user by name - best matches first
 def search_user_by_name(url, name):
     # users = dict_process(users_to_dict(ADMIN_DB.select_users()))
-    users = api.select(url)
-    if not users:
+    index = users_search_index(url)
+    if not index:
         return False
-    res = []
-    for user in users:
-        if name.lower() in user['name'].lower():
-            res.append(user)
-    if res:
-        return res
+    users, hits = index.search(name)
+    logging.info(f"Search user by name - {hits} hits of {len(index)} users")
+    if users:
+        return [dict(user) for user in users]
     return False
 
 
 # Search user by uuid
 def search_user_by_uuid(url, uuid):
     # users = dict_process(users_to_dict(ADMIN_DB.select_users()))
-    users = api.select(url)
-    if not users:
-        return False
-    for user in users:
-        if user['uuid'] == uuid:
-            return user
-    return False
+    return user_info(url, uuid.strip())
 
 
 # Base64 decoder
@@ -432,70 +556,183 @@ def expired_users_list(users):
     return expired_users
 
 
-# Text to QR code
+# Bounded LRU caches - QR images by text and Telegram file_ids by (bot token, text)
+qr_images_cache = OrderedDict()
+qr_file_ids_cache = OrderedDict()
+# Lock of all LRU caches (lru_get/lru_set) - sub_parse_cache too
+lru_cache_lock = threading.Lock()
+
+
+def lru_get(cache, key):
+    with lru_cache_lock:
+        value = cache.get(key)
+        if value is not None:
+            cache.move_to_end(key)
+        return value
+
+
+def lru_set(cache, key, value, max_size):
+    with lru_cache_lock:
+        cache[key] = value
+        cache.move_to_end(key)
+        while len(cache) > max_size:
+            cache.popitem(last=False)
+
+
+# Number of files in QR_CACHE_LOC - counted on first write
+qr_disk_files = None
+qr_disk_lock = threading.Lock()
+
+
+# Keep at most QR_DISK_CACHE_SIZE files on disk - least recently used (oldest mtime) are removed
+def qr_disk_added():
+    global qr_disk_files
+    with qr_disk_lock:
+        if qr_disk_files is None:
+            qr_disk_files = sum(1 for entry in os.scandir(QR_CACHE_LOC) if entry.name.endswith(".png"))
+        else:
+            qr_disk_files += 1
+        if qr_disk_files <= QR_DISK_CACHE_SIZE:
+            return
+        entries = sorted((entry for entry in os.scandir(QR_CACHE_LOC) if entry.name.endswith(".png")),
+                         key=lambda entry: entry.stat().st_mtime)
+        # remove a tenth more than needed, so files are not removed on every write
+        remove = len(entries) - QR_DISK_CACHE_SIZE + QR_DISK_CACHE_SIZE // 10
+        removed = 0
+        for entry in entries[:remove]:
+            try:
+                os.remove(entry.path)
+                removed += 1
+            except OSError as e:
+                logging.warning(f"Error while removing QR cache file \n Error:{e}")
+        qr_disk_files = len(entries) - removed
+
+
+# Text to QR code - cached in memory and on disk
 def txt_to_qr(txt):
-    qr = qrcode.QRCode(
-        version=1,
-        error_correction=qrcode.constants.ERROR_CORRECT_L,
-        box_size=10,
-        border=1,
-    )
-    qr.add_data(txt)
-    qr.make(fit=True, )
-    img_qr = qr.make_image(fill_color="black", back_color="white")
-    stream = BytesIO()
-    img_qr.save(stream)
-    img = stream.getvalue()
-
+    img = lru_get(qr_images_cache, txt)
+    if img:
+        return img
+    qr_file = os.path.join(QR_CACHE_LOC, f"{hashlib.sha256(txt.encode('utf-8')).hexdigest()}.png")
+    if os.path.exists(qr_file):
+        try:
+            with open(qr_file, 'rb') as f:
+                img = f.read()
+            # mark as recently used
+            os.utime(qr_file)
+        except OSError as e:
+            logging.warning(f"Error while reading QR cache file \n Error:{e}")
+    if not img:
+        qr = qrcode.QRCode(
+            version=1,
+            error_correction=qrcode.constants.ERROR_CORRECT_L,
+            box_size=10,
+            border=1,
+        )
+        qr.add_data(txt)
+        qr.make(fit=True, )
+        img_qr = qr.make_image(fill_color="black", back_color="white")
+        stream = BytesIO()
+        img_qr.save(stream)
+        img = stream.getvalue()
+        try:
+            with open(qr_file, 'wb') as f:
+                f.write(img)
+            qr_disk_added()
+        except OSError as e:
+            logging.warning(f"Error while writing QR cache file \n Error:{e}")
+    lru_set(qr_images_cache, txt, img, QR_CACHE_SIZE)
     return img
 
 
+# Send QR code of text - reuse Telegram file_id if this bot has sent it before
+def send_qr_photo(tbot, chat_id, txt, **kwargs):
+    key = (tbot.token, txt)
+    file_id = lru_get(qr_file_ids_cache, key)
+    if file_id:
+        try:
+            return tbot.send_photo(chat_id, photo=file_id, **kwargs)
+        except Exception as e:
+            logging.warning(f"Error while sending cached QR code, upload again \n Error:{e}")
+    qr_code = txt_to_qr(txt)
+    if not qr_code:
+        return None
+    msg = tbot.send_photo(chat_id, photo=qr_code, **kwargs)
+    if msg and msg.photo:
+        lru_set(qr_file_ids_cache, key, msg.photo[-1].file_id, QR_FILE_ID_CACHE_SIZE)
+    return msg
+
+
+# Get panel info of subscriptions on one server - return {uuid: user}
+# one subscription: single find, more: one users list request (cached)
+def server_subscriptions_info(url, uuids):
+    users = {}
+    if len(uuids) == 1:
+        user = api.find(url, uuids[0])
+        if user:
+            user = dict_process(url, users_to_dict([user]))
+            if user:
+                users[uuids[0]] = user[0]
+        return users
+    users_list = api.select(url)
+    if users_list:
+        uuids = set(uuids)
+        for user in users_list:
+            if user['uuid'] in uuids:
+                users[user['uuid']] = user
+    return users
+
+
+# Panel info of subscriptions (rows of USERS_DB.find_user_subscriptions) - one request per server in parallel
+# return [(subscription, user)] in subscriptions order, subscriptions not found in panel
+# (or on servers with no response in deadline seconds) are skipped
+def subscriptions_info(subscriptions, deadline=SERVERS_FAN_OUT_DEADLINE):
+    servers = {}
+    for subscription in subscriptions:
+        if subscription['server_id'] not in servers:
+            servers[subscription['server_id']] = {'id': subscription['server_id'], 'title': subscription['title'],
+                                                  'url': subscription['url'], 'uuids': []}
+        servers[subscription['server_id']]['uuids'].append(subscription['uuid'])
+    results, timed_out = servers_fan_out(
+        list(servers.values()),
+        lambda server: server_subscriptions_info(server['url'] + API_PATH, server['uuids']), deadline)
+    users = {server['id']: server_users for server, server_users in results}
+    subscriptions_users = []
+    for subscription in subscriptions:
+        user = users.get(subscription['server_id'], {}).get(subscription['uuid'])
+        if not user:
+            continue
+        user = dict(user)
+        user['sub_id'] = subscription['sub_id']
+        user['server_id'] = subscription['server_id']
+        subscriptions_users.append((subscription, user))
+    return subscriptions_users
+
+
+# Subscriptions of user (Link Subscription and ordered) - return (non_order_users, order_users)
+def user_subscriptions_info(telegram_id):
+    non_order_users, order_users = [], []
+    subscriptions = USERS_DB.find_user_subscriptions(telegram_id)
+    if not subscriptions:
+        return non_order_users, order_users
+    for subscription, user in subscriptions_info(subscriptions):
+        if subscription['sub_type'] == 'order':
+            order_users.append(user)
+        else:
+            non_order_users.append(user)
+    return non_order_users, order_users
+
+
 # List of users who not ordered from bot (Link Subscription)
 def non_order_user_info(telegram_id):
-    users_list = []
-    non_ordered_subscriptions = USERS_DB.find_non_order_subscription(telegram_id=telegram_id)
-    if non_ordered_subscriptions:
-        for subscription in non_ordered_subscriptions:
-            server_id = subscription['server_id']
-            server = USERS_DB.find_server(id=server_id)
-            if server:
-                server = server[0]
-                #if server['status']:
-                URL = server['url'] + API_PATH
-                non_order_user = api.find(URL, subscription['uuid'])
-                if non_order_user:
-                    non_order_user = users_to_dict([non_order_user])
-                    non_order_user = dict_process(URL, non_order_user, subscription['id'],server_id)
-                    if non_order_user:
-                        non_order_user = non_order_user[0]
-                        users_list.append(non_order_user)
-    return users_list
+    non_order_users, order_users = user_subscriptions_info(telegram_id)
+    return non_order_users
 
 
 # List of users who ordered from bot and made payment
 def order_user_info(telegram_id):
-    users_list = []
-    orders = USERS_DB.find_order(telegram_id=telegram_id)
-    if orders:
-        for order in orders:
-            ordered_subscriptions = USERS_DB.find_order_subscription(order_id=order['id'])
-            if ordered_subscriptions:
-                for subscription in ordered_subscriptions:
-                    server_id = subscription['server_id']
-                    server = USERS_DB.find_server(id=server_id)
-                    if server:
-                        server = server[0]
-                        #if server['status']:
-                        URL = server['url'] + API_PATH
-                        order_user = api.find(URL, subscription['uuid'])
-                        if order_user:
-                            order_user = users_to_dict([order_user])
-                            order_user = dict_process(URL, order_user, subscription['id'], server_id)
-                            if order_user:
-                                order_user = order_user[0]
-                                users_list.append(order_user)
-    return users_list
-
+    non_order_users, order_users = user_subscriptions_info(telegram_id)
+    return order_users
 
 
 # Replace last three characters of a string with random numbers (For Payment)
@@ -517,7 +754,16 @@ def privacy_friendly_logging_request(url):
     return url
 
 
+# Settings snapshot shared by both bots - reloaded only when USERS_DB.config_version changes
+settings_snapshot = {'version': None, 'settings': {}}
+
+
 def all_configs_settings():
+    version = USERS_DB.config_version
+    snapshot = settings_snapshot
+    if snapshot['version'] == version:
+        return dict(snapshot['settings'])
+
     bool_configs = USERS_DB.select_bool_config()
     int_configs = USERS_DB.select_int_config()
     str_configs = USERS_DB.select_str_config()
@@ -530,7 +776,8 @@ def all_configs_settings():
         all_configs[config['key']] = config['value']
     for config in str_configs:
         all_configs[config['key']] = config['value']
-    return all_configs
+    settings_snapshot.update({'version': version, 'settings': all_configs})
+    return dict(all_configs)
 
 
 def find_order_subscription_by_uuid(uuid):
@@ -592,13 +839,19 @@ def backup_json_bot():
     bk_json_file = os.path.join(back_dir, f"Backup_Bot_{dt_string}.json")
     with open(bk_json_file, 'w+') as f:
         json.dump(bk_json_data, f, indent=4)
+    # snapshot of database - the db file alone misses rows not yet checkpointed from WAL
+    bk_db_file = USERS_DB.backup_to_file(os.path.join(back_dir, f"Backup_Bot_{dt_string}.db"))
+    if not bk_db_file:
+        os.remove(bk_json_file)
+        return False
     zip_file = os.path.join(back_dir, f"Backup_Bot_{dt_string}.zip")
     with zipfile.ZipFile(zip_file, 'w') as zip:
         zip.write(bk_json_file,os.path.basename(bk_json_file))
-        zip.write(USERS_DB_LOC,os.path.basename(USERS_DB_LOC))
+        zip.write(bk_db_file,os.path.basename(USERS_DB_LOC))
         for file in os.listdir(RECEIPTIONS_LOC):
             zip.write(os.path.join(RECEIPTIONS_LOC, file),os.path.join(os.path.basename(RECEIPTIONS_LOC),file))
     os.remove(bk_json_file)
+    os.remove(bk_db_file)
     return zip_file
 
 
@@ -698,7 +951,16 @@ def debug_data():
     bk_json_data['servers'] = new_servers
     
     bk_json_data['str_config'] = [x for x in bk_json_data['str_config'] if x['key'] not in ['bot_token_admin','bot_token_client']]
-    
+
+    # Runtime stats of bot - not part of database backup
+    stats_data = {
+        'api_users_cache': api.users_cache_stats(),
+        'callback_stats': {'admin': admin_callbacks.stats_snapshot(), 'user': user_callbacks.stats_snapshot()},
+        'panel_mirror': [dict(server, url=privacy_friendly_logging_request(server['url']))
+                         for server in mirror.status()],
+        'query_plans': USERS_DB.explain_find_queries(),
+    }
+
     now = datetime.now()
     dt_string = now.strftime("%d-%m-%Y_%H-%M-%S")
     bk_json_file = os.path.join(BOT_BACKUP_LOC, f"DB_Data_{dt_string}.json")
@@ -707,6 +969,7 @@ def debug_data():
     zip_file = os.path.join(BOT_BACKUP_LOC, f"Debug_Data_{dt_string}.zip")
     with zipfile.ZipFile(zip_file, 'w') as zip:
         zip.write(bk_json_file,os.path.basename(bk_json_file))
+        zip.writestr(f"Stats_{dt_string}.json", json.dumps(stats_data, indent=4, default=str))
         if os.path.exists(os.path.join(os.getcwd(),"bot.log")):
             # only send last 1000 lines of log
             with open(os.path.join(os.getcwd(),"bot.log"), 'r') as f:
@@ -22,9 +22,78 @@ LOG_LOC = os.path.join(LOG_DIR, "hidyBot.log")
 BACKUP_LOC = os.path.join(os.getcwd(), "Backup")
 RECEIPTIONS_LOC = os.path.join(os.getcwd(), "UserBot", "Receiptions")
 BOT_BACKUP_LOC = os.path.join(os.getcwd(), "Backup", "Bot")
+QR_CACHE_LOC = os.path.join(os.getcwd(), "Cache", "QR")
 API_PATH = "/api/v2"
 HIDY_BOT_ID = "@HidyBotGroup"
 
+# Panel API connection pool (per server) and timeouts in seconds
+API_POOL_SIZE = 10
+API_CONNECT_TIMEOUT = 5
+API_READ_TIMEOUT = 30
+API_MAX_RETRIES = 2
+# Panel users list cache lifetime in seconds (0 to disable)
+API_USERS_CACHE_TTL = 30
+# Parallel requests to all servers - max workers and global deadline in seconds
+SERVERS_FAN_OUT_WORKERS = 8
+SERVERS_FAN_OUT_DEADLINE = 20
+# Bulk messages to users bot users - messages per second (Telegram allows ~30), retries on 429
+BROADCAST_RATE = 25
+BROADCAST_PROGRESS_EVERY = 200
+# Concurrent senders of a broadcast (they share the BROADCAST_RATE limit)
+BROADCAST_WORKERS = 8
+# Min seconds between two messages to the same chat
+TELEGRAM_CHAT_INTERVAL = 1
+TELEGRAM_MAX_RETRIES = 3
+# Reminder cronjob - concurrent senders and seconds to wait for users lists of servers
+# (not an interactive request, slow panels are waited for instead of being skipped)
+REMINDER_SEND_WORKERS = 4
+REMINDER_FAN_OUT_DEADLINE = 300
+# Force join channel - seconds to trust a member / not member result of get_chat_member
+# and number of users kept
+CHANNEL_MEMBER_TTL = 600
+CHANNEL_NOT_MEMBER_TTL = 30
+CHANNEL_STATUS_CACHE_SIZE = 10000
+# QR codes - images kept in memory, files kept in QR_CACHE_LOC and Telegram file_ids kept per bot
+QR_CACHE_SIZE = 256
+QR_DISK_CACHE_SIZE = 5000
+QR_FILE_ID_CACHE_SIZE = 4096
+# Parsed subscription configs lifetime in seconds and number of subscriptions kept
+SUB_PARSE_CACHE_TTL = 60
+SUB_PARSE_CACHE_SIZE = 1024
+# Bots runtime - "threads" (polling thread per bot), "asyncio" (one event loop for both bots)
+# or "webhook" (one HTTP server for both bots). Set HIDY_BOT_RUNTIME for the bots service, it is saved
+# in database (bot_runtime) so cronjobs see the same mode - see load_bot_runtime()
+BOT_RUNTIME = os.environ.get("HIDY_BOT_RUNTIME")
+# Asyncio runtime - handler worker threads and long polling timeout in seconds
+ASYNC_HANDLER_WORKERS = 16
+ASYNC_POLLING_TIMEOUT = 20
+# Webhook runtime - public base URL (bot path is appended), listen address and update workers
+WEBHOOK_URL = os.environ.get("HIDY_BOT_WEBHOOK_URL")
+WEBHOOK_LISTEN = os.environ.get("HIDY_BOT_WEBHOOK_LISTEN", "127.0.0.1")
+WEBHOOK_PORT = int(os.environ.get("HIDY_BOT_WEBHOOK_PORT", 8443))
+WEBHOOK_SECRET = os.environ.get("HIDY_BOT_WEBHOOK_SECRET")
+WEBHOOK_WORKERS = 8
+WEBHOOK_QUEUE_SIZE = 512
+# Keep admin bot chat sessions (selected server, lists) in database across restarts
+ADMIN_SESSIONS_PERSIST = False
+# Handler threads of admin bot - chat state is per chat, so admins are served in parallel
+ADMIN_BOT_THREADS = 4
+# Paged lists kept in memory of admin bot (next/previous page without fetching the list again)
+LIST_SNAPSHOTS_SIZE = 64
+# Local mirror of panel users - sync interval and max age (seconds) to serve reads from it
+PANEL_MIRROR_ENABLED = True
+PANEL_MIRROR_SYNC_INTERVAL = 60
+PANEL_MIRROR_MAX_AGE = 180
+# Pending next step handlers (multi-message flows) - max chats in memory, seconds until an abandoned flow
+# expires and seconds between batched writes to database
+NEXT_STEP_HANDLERS_SIZE = 10000
+NEXT_STEP_HANDLERS_TTL = 3600
+NEXT_STEP_HANDLERS_FLUSH_DELAY = 5
+# Panel backups - download chunk size (bytes), deadline (seconds) for all servers and parallel downloads
+PANEL_BACKUP_CHUNK_SIZE = 64 * 1024
+PANEL_BACKUP_DEADLINE = 600
+PANEL_BACKUP_WORKERS = 4
+
 # if directories not exists, create it
 if not os.path.exists(LOG_DIR):
     os.mkdir(LOG_DIR)
@@ -34,6 +103,8 @@ if not os.path.exists(BOT_BACKUP_LOC):
     os.mkdir(BOT_BACKUP_LOC)
 if not os.path.exists(RECEIPTIONS_LOC):
     os.mkdir(RECEIPTIONS_LOC)
+if not os.path.exists(QR_CACHE_LOC):
+    os.makedirs(QR_CACHE_LOC)
 
 # set logging  
 logging.basicConfig(handlers=[logging.FileHandler(filename=LOG_LOC,
@@ -76,6 +147,16 @@ def load_config(db):
         raise Exception(f"Error while loading config \nBe in touch with {HIDY_BOT_ID}")
 
 
+# Runtime of bots - HIDY_BOT_RUNTIME if set (saved to database), else the saved one
+def load_bot_runtime(db, conf):
+    runtime = BOT_RUNTIME
+    if runtime:
+        if runtime != conf.get('bot_runtime'):
+            db.edit_str_config("bot_runtime", value=runtime)
+        return runtime
+    return conf.get('bot_runtime') or "threads"
+
+
 def load_server_url(db):
     try:
         panel_url = db.select_servers()
@@ -210,4 +291,5 @@ db.set_default_configs()
 conf = load_config(db)
 server_url = load_server_url(db)
 set_config_variables(conf, server_url)
+BOT_RUNTIME = load_bot_runtime(db, conf)
 db.close()
\ No newline at end of file
@@ -1,12 +1,28 @@
 from threading import Thread
 import AdminBot.bot
-from config import CLIENT_TOKEN
+from config import CLIENT_TOKEN, BOT_RUNTIME
+from Utils import mirror
 
 # Start the admin bot
 if __name__ == '__main__':
-    Thread(target=AdminBot.bot.start).start()
-    # Start the user bot if the client token is set
-    if CLIENT_TOKEN:
-        import UserBot.bot
-        Thread(target=UserBot.bot.start).start()
-
+    # Keep local mirror of panel users up to date
+    mirror.start_sync()
+    if BOT_RUNTIME in ["asyncio", "webhook"]:
+        # Both bots in one event loop or one webhook server
+        if BOT_RUNTIME == "asyncio":
+            from Shared import runtime
+        else:
+            from Shared import webhook as runtime
+        bots = [AdminBot.bot]
+        if CLIENT_TOKEN:
+            import UserBot.bot
+            bots.append(UserBot.bot)
+        for bot_module in bots:
+            bot_module.setup()
+        runtime.start([bot_module.bot for bot_module in bots])
+    else:
+        Thread(target=AdminBot.bot.start).start()
+        # Start the user bot if the client token is set
+        if CLIENT_TOKEN:
+            import UserBot.bot
+            Thread(target=UserBot.bot.start).start()
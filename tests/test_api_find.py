@@ -0,0 +1,63 @@
+# Description: Single user read (api.find) - panel first, fresh mirror only while panel is unreachable.
+import pytest
+import requests
+from Utils import api, mirror
+
+URL = "https://panel.example.com/7frgemkvtE0/78854985-68dp-425c-989b-7ap0c6kr9bd4/api/v2"
+UUID = "2f3c8a1e-5b7d-4c9e-8f0a-1b2c3d4e5f60"
+PANEL_USER = {'uuid': UUID, 'name': "panel"}
+MIRROR_USER = {'uuid': UUID, 'name': "mirror"}
+
+
+class Response:
+    def __init__(self, status_code, data=None):
+        self.status_code = status_code
+        self.data = data
+        self.text = ""
+
+    def json(self):
+        return self.data
+
+
+class Session:
+    def __init__(self, result):
+        self.result = result
+
+    def get(self, url, **kwargs):
+        if isinstance(self.result, Exception):
+            raise self.result
+        return self.result
+
+
+@pytest.fixture
+def panel(monkeypatch):
+    monkeypatch.setattr(api, "get_auth_headers", lambda url: {})
+    monkeypatch.setattr(mirror, "is_fresh", lambda url: True)
+    monkeypatch.setattr(mirror, "staleness", lambda url: 30)
+    monkeypatch.setattr(mirror, "get_user", lambda url, uuid: dict(MIRROR_USER))
+
+    def respond(result):
+        monkeypatch.setattr(api, "get_session", lambda url: Session(result))
+    return respond
+
+
+def test_find_reads_panel(panel):
+    panel(Response(200, PANEL_USER))
+    assert api.find(URL, UUID) == PANEL_USER
+
+
+def test_find_not_found_in_panel(panel):
+    panel(Response(404))
+    assert api.find(URL, UUID) is None
+
+
+@pytest.mark.parametrize("result", [Response(502), Response(503), requests.exceptions.ConnectionError()])
+def test_find_falls_back_to_mirror(panel, result):
+    panel(result)
+    assert api.find(URL, UUID) == MIRROR_USER
+
+
+def test_find_skips_stale_mirror(panel, monkeypatch):
+    panel(Response(504))
+    monkeypatch.setattr(mirror, "is_fresh", lambda url: False)
+    assert api.find(URL, UUID) is None
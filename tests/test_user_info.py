@@ -0,0 +1,61 @@
+# Description: Single user info (utils.user_info) - panel user is processed like users lists,
+# so it can be shown with AdminBot user_info_template.
+from AdminBot import templates
+from AdminBot.content import MESSAGES
+from Utils import api, utils
+
+URL = "https://panel.example.com/7frgemkvtE0/78854985-68dp-425c-989b-7ap0c6kr9bd4/api/v2"
+SERVER = {'id': 1, 'title': "Main Server", 'url': "https://panel.example.com/7frgemkvtE0"}
+
+# User as returned by panel API (GET /admin/user/{uuid}/)
+PANEL_USER = {
+    'uuid': "2f3c8a1e-5b7d-4c9e-8f0a-1b2c3d4e5f60",
+    'name': "test_user",
+    'last_online': "1-01-01 00:00:00",
+    'usage_limit_GB': 30.0,
+    'package_days': 30,
+    'mode': "no_reset",
+    'start_date': None,
+    'current_usage_GB': 12.5,
+    'last_reset_time': None,
+    'comment': None,
+    'telegram_id': None,
+    'added_by_uuid': None,
+    'enable': True,
+}
+
+
+def find_panel_user(url, uuid, endpoint="/admin/user/"):
+    if uuid == PANEL_USER['uuid']:
+        return dict(PANEL_USER)
+    return None
+
+
+def test_user_info_is_processed(monkeypatch):
+    monkeypatch.setattr(api, "find", find_panel_user)
+    usr = utils.user_info(URL, PANEL_USER['uuid'])
+    assert usr['uuid'] == PANEL_USER['uuid']
+    assert usr['usage'] == {'usage_limit_GB': 30.0, 'current_usage_GB': 12.5, 'remaining_usage_GB': 17.5}
+    assert usr['remaining_day'] == 30
+    assert usr['last_connection'] == MESSAGES['NEVER']
+    assert usr['link'] == f"https://panel.example.com/7frgemkvtE0/{PANEL_USER['uuid']}/"
+
+
+def test_user_info_template(monkeypatch):
+    monkeypatch.setattr(api, "find", find_panel_user)
+    usr = utils.user_info(URL, PANEL_USER['uuid'])
+    msg = templates.user_info_template(usr, SERVER)
+    assert PANEL_USER['name'] in msg
+    assert SERVER['title'] in msg
+    assert f"30 {MESSAGES['DAY_EXPIRE']}" in msg
+
+
+def test_search_user_by_uuid(monkeypatch):
+    monkeypatch.setattr(api, "find", find_panel_user)
+    usr = utils.search_user_by_uuid(URL, f" {PANEL_USER['uuid']} ")
+    assert templates.user_info_template(usr, SERVER)
+
+
+def test_user_info_not_found(monkeypatch):
+    monkeypatch.setattr(api, "find", find_panel_user)
+    assert utils.user_info(URL, "00000000-0000-0000-0000-000000000000") is False